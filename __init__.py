@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+# the utilities and their backends are imported on first attribute access,
+# so `from utils import Logger` does not pay for openai, aiobotocore, aioredis or yaml
+import importlib
+
+from typing import Any, List
+
+_MODULES = ("configs", "llm", "logs", "minio", "redis")
+_EXPORTS = {
+    "ConfigUtils": "configs",
+    "ConfigSnapshot": "configs",
+    "Logger": "logs",
+    "BoundLogger": "logs",
+    "SyncLogger": "logs",
+    "LoggerConfig": "logs",
+    "LoggingHandler": "logs",
+    "Levels": "logs",
+    "Styles": "logs",
+    "Styled": "logs",
+    "Lazy": "logs",
+    "read_records": "logs",
+    "RedisUtils": "redis",
+    "RateLimiter": "redis",
+    "LeaseLock": "redis",
+    "BatchedCounter": "redis",
+    "MinioUtils": "minio",
+    "OpenAILLM": "llm",
+    "StreamChunk": "llm",
+    "ChoiceDelta": "llm",
+    "StreamAccumulator": "llm",
+    "CallMetrics": "llm",
+    "LLMMetrics": "llm",
+    "LoggerExporter": "llm",
+}
+
+__all__ = list(_MODULES) + list(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    if name in _MODULES:
+        value = importlib.import_module(f".{name}", __name__)
+    elif name in _EXPORTS:
+        value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
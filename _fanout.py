@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# ordered-pull, bounded-concurrency fan-out shared by minio.read_many and llm.chat_many
+import asyncio
+
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable, Optional, Tuple, Union
+
+_DONE = object()
+
+
+async def fan_out(items: Union[Iterable[Any], AsyncIterable[Any]], func: Callable[[Any], Awaitable[Any]],
+                  concurrency: int) -> AsyncIterator[Tuple[Any, Any, Optional[Exception]]]:
+    """
+    Await func(item) for every item with at most concurrency calls in flight,
+    yielding (item, result, None) or (item, None, error) in completion order.
+    Items are pulled lazily and finished calls wait for the consumer, so
+    memory stays bounded. An error raised by items itself is re-raised once
+    the calls in flight are done.
+    """
+    if hasattr(items, "__aiter__"):
+        source = items.__aiter__()
+        source_lock = asyncio.Lock()
+
+        async def next_item():
+            # async generators can't be advanced by several workers at once
+            async with source_lock:
+                return await source.__anext__()
+    else:
+        source_iter = iter(items)
+
+        async def next_item():
+            try:
+                return next(source_iter)
+            except StopIteration:
+                raise StopAsyncIteration
+
+    results: asyncio.Queue = asyncio.Queue(concurrency)
+
+    async def worker():
+        while True:
+            try:
+                item = await next_item()
+            except StopAsyncIteration:
+                return
+            try:
+                await results.put((item, await func(item), None))
+            except Exception as e:
+                await results.put((item, None, e))
+
+    async def run():
+        try:
+            return await asyncio.gather(*workers, return_exceptions=True)
+        finally:
+            await results.put(_DONE)
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+    runner = asyncio.ensure_future(run())
+    try:
+        while True:
+            result = await results.get()
+            if result is _DONE:
+                break
+            yield result
+        for outcome in await runner:
+            if isinstance(outcome, BaseException):
+                raise outcome
+    finally:
+        for task in (*workers, runner):
+            task.cancel()
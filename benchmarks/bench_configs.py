@@ -0,0 +1,91 @@
+# parse/dump times of every installed backend of the configs codec registry, then what a
+# ConfigUtils(cache=True) read of an unchanged file costs next to parsing it again
+# usage: python benchmarks/bench_configs.py [sections] [keys_per_section]
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from configs import ConfigUtils, codec_backends, get_codec  # noqa: E402
+
+
+def make_config(sections, keys):
+    return {
+        f"section_{i}": {
+            f"key_{j}": (j if j % 3 == 0 else f"value {i}.{j}" if j % 3 == 1 else j * 0.5)
+            for j in range(keys)
+        } for i in range(sections)
+    }
+
+
+def timeit(func, arg, min_time=0.5):
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        func(arg)
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return elapsed / runs
+
+
+def time_async(func, min_time=0.5):
+    async def run():
+        runs = 0
+        start = time.perf_counter()
+        while True:
+            await func()
+            runs += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                return elapsed / runs
+    return asyncio.run(run())
+
+
+async def prime(utils, config):
+    await utils.save(config)
+    await utils.read_snapshot()
+
+
+def cached_reads(config):
+    print(f"\n{'format':<8} {'parse ms':>10} {'read ms':>10} {'snapshot ms':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ("json", "yaml", "toml", "msgpack"):
+            try:
+                loads, dumps = get_codec(name)
+            except ImportError:
+                continue
+            utils = ConfigUtils(os.path.join(tmp, f"config.{name}"), cache=True)
+            asyncio.run(prime(utils, config))
+            parse = timeit(loads, dumps(config)) * 1000
+            read = time_async(utils.read) * 1000
+            snapshot = time_async(utils.read_snapshot) * 1000
+            print(f"{name:<8} {parse:>10.2f} {read:>10.2f} {snapshot:>12.3f}")
+
+
+def main():
+    sections = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    keys = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    config = make_config(sections, keys)
+    print(f"{'format':<8} {'backend':<13} {'size':>10} {'parse ms':>10} {'dump ms':>10}")
+    for name in ("json", "yaml", "toml", "ini", "msgpack"):
+        try:
+            backends = codec_backends(name)
+            # every backend parses the same bytes
+            content = backends[-1][2](config)
+        except ImportError:
+            continue
+        for i, (backend, loads, dumps) in enumerate(backends):
+            marker = "*" if i == 0 else ""
+            parse = timeit(loads, content) * 1000
+            dump = timeit(dumps, config) * 1000
+            print(f"{name:<8} {backend + marker:<13} {len(content):>10,} {parse:>10.2f} {dump:>10.2f}")
+    print("* picked by the registry by default")
+    cached_reads(config)
+
+
+if __name__ == "__main__":
+    main()
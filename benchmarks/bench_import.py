@@ -0,0 +1,72 @@
+# import cost of the package facade per entry point, from `python -X importtime` in a fresh interpreter;
+# exits 1 when an entry point goes over its budget or imports a backend it should not need
+# usage: python benchmarks/bench_import.py [budget_scale]
+import os
+import subprocess
+import sys
+
+from standins import ROOT
+
+LOAD = ("import importlib.util, sys; "
+        "spec = importlib.util.spec_from_file_location('utils', {init!r}, submodule_search_locations=[{root!r}]); "
+        "utils = sys.modules['utils'] = importlib.util.module_from_spec(spec); spec.loader.exec_module(utils); ")
+
+# entry point -> (statement, budget ms, top-level modules it must not import)
+BUDGETS = {
+    "package": ("pass", 20, ("asyncio", "openai", "httpx", "aiobotocore", "aioredis", "yaml", "toml")),
+    "Logger": ("utils.Logger", 150, ("openai", "httpx", "aiobotocore", "aioredis", "yaml", "toml", "filelock")),
+    "ConfigUtils": ("utils.ConfigUtils", 250, ("openai", "httpx", "aiobotocore", "aioredis", "yaml", "toml")),
+    "RedisUtils": ("utils.RedisUtils", 400, ("openai", "httpx", "aiobotocore")),
+    "MinioUtils": ("utils.MinioUtils", 800, ("openai", "httpx", "aioredis", "yaml")),
+    "OpenAILLM": ("utils.OpenAILLM", 1200, ("aiobotocore", "aioredis", "yaml")),
+}
+
+
+def importtime(code):
+    """{module: cumulative us} of every module imported while running code."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            # nested imports are indented by two spaces per level after the separator's space
+            modules[name[1:].rstrip()] = int(cumulative)
+    return modules
+
+
+def cost(modules, baseline):
+    # cumulative times of the outermost imports that the interpreter startup did not already do
+    return sum(us for name, us in modules.items() if not name.startswith(" ") and name not in baseline) / 1000
+
+
+def main():
+    scale = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    load = LOAD.format(init=os.path.join(ROOT, "__init__.py"), root=ROOT)
+    baseline = importtime("pass")
+    failed = False
+    print(f"{'entry point':<12} {'ms':>8} {'budget':>8}  result")
+    for name, (statement, budget, forbidden) in BUDGETS.items():
+        try:
+            modules = importtime(load + statement)
+        except RuntimeError as e:  # a backend missing in this environment
+            print(f"{name:<12} {'':>8} {budget * scale:>8.0f}  skipped ({e})")
+            continue
+        elapsed = cost(modules, baseline)
+        loaded = {module.strip() for module in modules}
+        leaked = [module for module in forbidden if module in loaded]
+        problems = []
+        if elapsed > budget * scale:
+            problems.append("over budget")
+        if leaked:
+            problems.append("imports " + ", ".join(leaked))
+        failed = failed or bool(problems)
+        print(f"{name:<12} {elapsed:>8.1f} {budget * scale:>8.0f}  {'; '.join(problems) or 'ok'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
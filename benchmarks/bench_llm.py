@@ -0,0 +1,71 @@
+# request concurrency of OpenAILLM against a mock chat completions server with a fixed latency,
+# or an existing OpenAI-compatible endpoint given with OPENAI_BASE_URL / OPENAI_API_KEY / OPENAI_MODEL
+# usage: python benchmarks/bench_llm.py [requests] [latency_s]
+import asyncio
+import os
+import sys
+import time
+
+from standins import load_package, openai_server
+
+OpenAILLM = load_package().OpenAILLM
+
+
+async def sequential(llm, messages, requests, concurrency):
+    for _ in range(requests):
+        await llm.chatNoStream(messages)
+
+
+async def gathered(llm, messages, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await llm.chatNoStream(messages)
+    await asyncio.gather(*(one() for _ in range(requests)))
+
+
+async def streamed(llm, messages, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            async for _ in llm.chatStream(messages):
+                pass
+    await asyncio.gather(*(one() for _ in range(requests)))
+
+
+async def many(llm, messages, requests, concurrency):
+    async for _, _, error in llm.chat_many((messages for _ in range(requests)), max_concurrency=concurrency):
+        if error is not None:
+            raise error
+
+
+async def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    base_url, stop = await openai_server(latency)
+    model = os.environ.get("OPENAI_MODEL", "mock")
+    messages = [{"role": "user", "content": "hi"}]
+    try:
+        print(f"{requests} requests, {latency * 1000:.0f} ms server latency, {base_url}")
+        print(f"{'scenario':<24} {'concurrency':>11} {'req/s':>9} {'ideal':>9}")
+        for name, scenario, concurrency in (
+                ("sequential", sequential, 1),
+                ("gather", gathered, 16),
+                ("gather", gathered, 64),
+                ("stream", streamed, 64),
+                ("chat_many", many, 64)):
+            async with OpenAILLM(base_url=base_url, api_key=os.environ.get("OPENAI_API_KEY", "mock"),
+                                 default_model_name=model) as llm:
+                await scenario(llm, messages, min(requests, concurrency), concurrency)  # open the connections
+                start = time.perf_counter()
+                await scenario(llm, messages, requests, concurrency)
+                rate = requests / (time.perf_counter() - start)
+            print(f"{name:<24} {concurrency:>11} {rate:>9.1f} {concurrency / latency:>9.1f}")
+    finally:
+        await stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,57 @@
+# micro-benchmark for the per-line cost of logs.Logger
+# usage: python benchmarks/bench_logs.py [lines]
+import asyncio
+import copy
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from logs import Logger, LoggerConfig, Levels  # noqa: E402
+
+
+class LegacyLogger(Logger):
+    # rebuilds the prefix through Styled on every call, like the logger used to
+    def _render(self, level, text, source="print"):
+        prefix = self._make_prefix_s(level, source)
+        return "{}{}".format(
+            str(prefix) if self.config[source]["colored"] else prefix.plain,
+            str(text) if self.config[source]["colored"] else text.plain
+        )
+
+
+async def run(logger, lines, level=Levels.INFO):
+    stdout = sys.stdout
+    sys.stdout = io.StringIO()
+    try:
+        start = time.perf_counter()
+        for i in range(lines):
+            await logger.log(level, "processed item {} of {}", i, lines)
+        return time.perf_counter() - start
+    finally:
+        sys.stdout = stdout
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    config = copy.deepcopy(LoggerConfig.DEFAULT_CONFIG)
+    config["file"]["enabled"] = False
+    for colored in (False, True):
+        config["print"]["colored"] = colored
+        results = {}
+        for name, cls in (("legacy", LegacyLogger), ("compiled", Logger)):
+            elapsed = asyncio.run(run(cls(config), lines))
+            results[name] = lines / elapsed
+            print(f"{name:>9} colored={colored!s:<5} {results[name]:>12,.0f} lines/s")
+        print(f"{'speedup':>9} colored={colored!s:<5} {results['compiled'] / results['legacy']:>12.2f}x")
+
+    # debug calls below the configured level should cost next to nothing
+    config["print"]["log_level"] = Levels.INFO
+    elapsed = asyncio.run(run(Logger(config), lines, Levels.DEBUG))
+    print(f"{'filtered':>9} {'':<13} {lines / elapsed:>12,.0f} calls/s")
+
+
+if __name__ == "__main__":
+    main()
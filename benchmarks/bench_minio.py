@@ -0,0 +1,82 @@
+# per-read latency and bulk read throughput of MinioUtils against a local S3 stand-in (moto's server),
+# or an existing endpoint given with S3_ENDPOINT / S3_ACCESS_KEY / S3_SECRET_KEY
+# usage: python benchmarks/bench_minio.py [reads] [object_size]
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from aiobotocore.session import get_session  # noqa: E402
+from minio import MinioUtils  # noqa: E402
+from standins import s3_endpoint  # noqa: E402
+
+BUCKET = "bench"
+
+
+async def legacy_read(utils, object_name):
+    # what read_file did before the client was shared: a new session and client per read
+    async with get_session().create_client(
+        "s3",
+        endpoint_url=utils.endpoint_url,
+        aws_access_key_id=utils.access_key,
+        aws_secret_access_key=utils.secret_key,
+        region_name="us-east-1"
+    ) as client:
+        response = await client.get_object(Bucket=BUCKET, Key=object_name)
+        async with response["Body"] as stream:
+            return await stream.read()
+
+
+async def measure(read, utils, reads):
+    latencies = []
+    for i in range(reads):
+        start = time.perf_counter()
+        await read(utils, f"object-{i % 16}")
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+async def main():
+    reads = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 4096
+    endpoint, access_key, secret_key, stop = s3_endpoint()
+    try:
+        async with MinioUtils(endpoint, access_key, secret_key, BUCKET, region_name="us-east-1") as utils:
+            client = await utils.client()
+            try:
+                await client.create_bucket(Bucket=BUCKET)
+            except client.exceptions.BucketAlreadyOwnedByYou:
+                pass
+            payload = os.urandom(size)
+            for i in range(16):
+                await client.put_object(Bucket=BUCKET, Key=f"object-{i}", Body=payload)
+
+            async def shared_read(utils, object_name):
+                return await utils.read_file(object_name)
+
+            print(f"{reads} reads of {size:,} bytes from {endpoint}")
+            print(f"{'client':<16} {'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9}")
+            for name, read in (("per-read", legacy_read), ("shared", shared_read)):
+                latencies = sorted(await measure(read, utils, reads))
+                p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+                print(f"{name:<16} {statistics.mean(latencies):>9.2f} "
+                      f"{statistics.median(latencies):>9.2f} {p99:>9.2f}")
+
+            print(f"{'concurrency':<16} {'reads/s':>9} {'MB/s':>9}")
+            for concurrency in (1, 4, 16, 32):
+                start = time.perf_counter()
+                async for _, data, error in utils.read_many((f"object-{i % 16}" for i in range(reads)),
+                                                            concurrency=concurrency):
+                    if error is not None:
+                        raise error
+                elapsed = time.perf_counter() - start
+                print(f"{concurrency:<16} {reads / elapsed:>9.1f} {reads * size / elapsed / 1e6:>9.2f}")
+    finally:
+        stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
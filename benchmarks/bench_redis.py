@@ -0,0 +1,71 @@
+# ops/sec of RedisUtils against a fake Redis server (fakeredis), or an existing one given with REDIS_URL
+# usage: python benchmarks/bench_redis.py [ops] [concurrency]
+import asyncio
+import sys
+import time
+
+from standins import load_package, redis_url
+
+# through the package: a flat `import redis` would shadow redis-py, which fakeredis imports
+RedisUtils = load_package().RedisUtils
+
+
+async def sequential_get(utils, ops, concurrency):
+    for i in range(ops):
+        await utils.get(f"key-{i % 1000}")
+
+
+async def concurrent_get(utils, ops, concurrency):
+    async def worker(offset):
+        for i in range(offset, ops, concurrency):
+            await utils.get(f"key-{i % 1000}")
+    await asyncio.gather(*(worker(offset) for offset in range(concurrency)))
+
+
+async def bulk_get(utils, ops, concurrency):
+    await utils.mget_many([f"key-{i % 1000}" for i in range(ops)])
+
+
+async def bulk_set(utils, ops, concurrency):
+    await utils.mset_many({f"key-{i % 1000}-{i}": "x" * 64 for i in range(ops)})
+
+
+async def measure(url, scenario, ops, concurrency, **kwargs):
+    utils = RedisUtils(url, **kwargs)
+    try:
+        await utils.mset_many({f"key-{i}": "x" * 64 for i in range(1000)})
+        await scenario(utils, min(ops, 100), concurrency)  # warm up the pool and the cache
+        start = time.perf_counter()
+        await scenario(utils, ops, concurrency)
+        return ops / (time.perf_counter() - start)
+    finally:
+        await utils.disconnect()
+
+
+async def main(url):
+    ops = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    print(f"{ops:,} ops, {concurrency} concurrent callers, {url}")
+    print(f"{'scenario':<28} {'ops/s':>12}")
+    for name, scenario, kwargs in (
+            ("get sequential", sequential_get, {}),
+            ("get concurrent", concurrent_get, {}),
+            ("get concurrent pooled", concurrent_get, {"max_connections": 8}),
+            ("get concurrent pipelined", concurrent_get, {"auto_pipeline": True}),
+            ("get client cache", concurrent_get, {"client_cache": True}),
+            ("mget_many", bulk_get, {}),
+            ("mset_many", bulk_set, {})):
+        try:
+            rate = await measure(url, scenario, ops, concurrency, **kwargs)
+        except Exception as e:  # e.g. no CLIENT TRACKING on the server
+            print(f"{name:<28} {'skipped':>12} ({type(e).__name__}: {e})")
+            continue
+        print(f"{name:<28} {rate:>12,.0f}")
+
+
+if __name__ == "__main__":
+    url, stop = redis_url()
+    try:
+        asyncio.run(main(url))
+    finally:
+        stop()
@@ -0,0 +1,39 @@
+# runs every benchmark with fixed sizes against the local stand-ins (see standins.py), one fresh interpreter each;
+# exits 1 if any of them fails, including bench_import going over its budgets
+# usage: python benchmarks/run_all.py [--quick]
+import os
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+SUITE = (
+    ("bench_import.py", (), ()),
+    ("bench_logs.py", ("100000",), ("20000",)),
+    ("bench_configs.py", ("200", "50"), ("50", "20")),
+    ("bench_redis.py", ("20000", "64"), ("2000", "32")),
+    ("bench_minio.py", ("200", "65536"), ("32", "16384")),
+    ("bench_llm.py", ("200", "0.05"), ("64", "0.02")),
+)
+
+
+def main():
+    quick = "--quick" in sys.argv[1:]
+    failed = []
+    for script, args, quick_args in SUITE:
+        print(f"== {script}", flush=True)
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, os.path.join(HERE, script), *(quick_args if quick else args)],
+                                cwd=HERE)
+        print(f"-- {script}: {'ok' if result.returncode == 0 else 'failed'} "
+              f"in {time.perf_counter() - start:.1f}s\n", flush=True)
+        if result.returncode != 0:
+            failed.append(script)
+    if failed:
+        print("failed: " + ", ".join(failed))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
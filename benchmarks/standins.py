@@ -0,0 +1,98 @@
+# local stand-ins for the services the utilities talk to, so the benchmarks run without network access:
+# an S3 stub (moto), a fake Redis server (fakeredis) and a mock OpenAI chat completions server (aiohttp).
+# each one defers to a real endpoint when its environment variable is set.
+import asyncio
+import importlib.util
+import json
+import logging
+import os
+import sys
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_package(name="utils"):
+    # the repo as a package: keeps the root off sys.path, where redis.py would shadow redis-py (fakeredis needs it)
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, "__init__.py"),
+                                                  submodule_search_locations=[ROOT])
+    package = importlib.util.module_from_spec(spec)
+    sys.modules[name] = package
+    spec.loader.exec_module(package)
+    return package
+
+
+def s3_endpoint():
+    """(endpoint, access_key, secret_key, stop) from S3_ENDPOINT / S3_ACCESS_KEY / S3_SECRET_KEY or moto."""
+    endpoint = os.environ.get("S3_ENDPOINT")
+    if endpoint:
+        return endpoint, os.environ.get("S3_ACCESS_KEY", ""), os.environ.get("S3_SECRET_KEY", ""), lambda: None
+    from moto.server import ThreadedMotoServer
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    return f"http://{host}:{port}", "test", "test", server.stop
+
+
+def redis_url():
+    """(url, stop) from REDIS_URL or a fakeredis TCP server on a free port."""
+    url = os.environ.get("REDIS_URL")
+    if url:
+        return url, lambda: None
+    from fakeredis import TcpFakeServer
+    server = TcpFakeServer(("127.0.0.1", 0))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def stop():
+        server.shutdown()
+        server.server_close()
+    host, port = server.server_address
+    return f"redis://{host}:{port}", stop
+
+
+async def openai_server(latency=0.05, words=("Hello", " from", " the", " mock", " server", ".")):
+    """
+    (base_url, stop) from OPENAI_BASE_URL or an aiohttp server answering chat completions after latency
+    seconds; streams one chunk per word. Must be awaited inside the running loop.
+    """
+    url = os.environ.get("OPENAI_BASE_URL")
+    if url:
+        async def noop():
+            pass
+        return url, noop
+    from aiohttp import web
+    usage = {"prompt_tokens": 8, "completion_tokens": len(words), "total_tokens": 8 + len(words)}
+
+    async def chat(request):
+        body = await request.json()
+        await asyncio.sleep(latency)
+        base = {"id": "chatcmpl-bench", "created": 0, "model": body["model"]}
+        if not body.get("stream"):
+            return web.json_response(dict(base, object="chat.completion", usage=usage, choices=[
+                {"index": 0, "message": {"role": "assistant", "content": "".join(words)}, "finish_reason": "stop"}
+            ]))
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for i, word in enumerate(words):
+            chunk = dict(base, object="chat.completion.chunk", choices=[
+                {"index": 0, "delta": {"role": "assistant" if i == 0 else None, "content": word},
+                 "finish_reason": None}
+            ])
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        chunk = dict(base, object="chat.completion.chunk", usage=usage,
+                     choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        await response.write(f"data: {json.dumps(chunk)}\n\ndata: [DONE]\n\n".encode())
+        return response
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", chat)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    return f"http://{host}:{port}/v1", runner.cleanup
@@ -1,12 +1,329 @@
 # -*- coding: utf-8 -*-
+import asyncio
+import copy
+import ctypes
+import ctypes.util
+import inspect
 import json
-import yaml
-import toml
+import os
+import stat
+import sys
+import tempfile
 import configparser
 import aiofiles
+from collections.abc import Mapping
 from filelock import AsyncFileLock
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Any, Optional, Union
+from typing import Awaitable, Callable, Dict, Any, Iterator, List, Optional, Tuple, Union
+
+# inotify events that can mean the config file was (re)written
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+
+ChangeCallback = Callable[[Dict[str, Any], Dict[str, Dict[str, Any]]], Optional[Awaitable[None]]]
+Loader = Callable[[bytes], Dict[str, Any]]
+Dumper = Callable[[Dict[str, Any]], bytes]
+
+_CODECS: Dict[str, Tuple[Loader, Dumper]] = {}
+_EXTENSIONS: Dict[str, str] = {}
+# built-in formats whose backend is picked (and imported) on first use
+_BUILTIN_FORMATS = {'ini': ('.ini', '.inf'), 'json': ('.json',), 'yaml': ('.yaml', '.yml'),
+                    'toml': ('.toml',), 'msgpack': ('.msgpack', '.mpk')}
+
+
+def register_codec(name: str, loads: Loader, dumps: Dumper, extensions: Tuple[str, ...] = ()) -> None:
+    """
+    Register (or replace) the loader and dumper used for a config format.
+
+    Args:
+        name: Format name
+        loads: Parses the raw file bytes into a dict
+        dumps: Serializes a dict into the raw file bytes
+        extensions: File extensions handled by this format, e.g. ('.yaml', '.yml')
+    """
+    _CODECS[name] = (loads, dumps)
+    for ext in extensions:
+        _EXTENSIONS[ext.lower()] = name
+
+
+def get_codec(name: str) -> Tuple[Loader, Dumper]:
+    """Return the (loads, dumps) pair registered for a format."""
+    try:
+        return _CODECS[name]
+    except KeyError:
+        if name not in _BUILTIN_FORMATS:
+            raise ValueError(f"Unsupported config format: {name}")
+    _, loads, dumps = codec_backends(name)[0]
+    _CODECS[name] = (loads, dumps)
+    return loads, dumps
+
+
+def _dump_ini(config: Dict[str, Any]) -> bytes:
+    parser = configparser.ConfigParser()
+    for section, values in config.items():
+        if not isinstance(values, dict):
+            # Handle non-dict values at root level
+            if 'DEFAULT' not in parser:
+                parser['DEFAULT'] = {}
+            parser['DEFAULT'][section] = str(values)
+            continue
+
+        parser[section] = {}
+        for key, value in values.items():
+            parser[section][key] = str(value)
+
+    lines = []
+    for section in parser.sections():
+        lines.append(f"[{section}]\n")
+        for key, value in parser[section].items():
+            lines.append(f"{key} = {value}\n")
+        lines.append("\n")
+    return "".join(lines).encode('utf-8')
+
+
+def _load_ini(content: bytes) -> Dict[str, Any]:
+    config = configparser.ConfigParser()
+    config.read_string(content.decode('utf-8'))
+    return {section: dict(config[section]) for section in config.sections()}
+
+
+def _dump_toml(config: Dict[str, Any]) -> bytes:
+    import toml
+    return toml.dumps(config).encode('utf-8')
+
+
+def _dump_json(config: Dict[str, Any]) -> bytes:
+    return json.dumps(config, indent=2).encode('utf-8')
+
+
+# orjson reads integers beyond 64 bits as floats; any run of 20+ digits is parsed by json instead.
+# mapping every digit to 0 and searching for 20 zeros is far cheaper than a regex scan
+_DIGITS_TO_ZERO = bytes.maketrans(b"123456789", b"000000000")
+_LONG_DIGITS = b"0" * 20
+
+
+def _load_orjson(content: bytes) -> Dict[str, Any]:
+    import orjson
+    if _LONG_DIGITS in content.translate(_DIGITS_TO_ZERO):
+        return json.loads(content)
+    return orjson.loads(content)
+
+
+def _dump_orjson(config: Dict[str, Any]) -> bytes:
+    import orjson
+    try:
+        return orjson.dumps(config, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    except TypeError:  # e.g. ints wider than 64 bits
+        return _dump_json(config)
+
+
+def _load_msgpack(content: bytes) -> Dict[str, Any]:
+    import msgpack
+    return msgpack.unpackb(content)
+
+
+def _dump_msgpack(config: Dict[str, Any]) -> bytes:
+    import msgpack
+    return msgpack.packb(config)
+
+
+def codec_backends(name: str) -> List[Tuple[str, Loader, Dumper]]:
+    """List the installed (backend, loads, dumps) choices of a built-in format, fastest first."""
+    backends = []
+    if name == 'json':
+        try:
+            import orjson
+            backends.append(('orjson', _load_orjson, _dump_orjson))
+        except ImportError:
+            pass
+        backends.append(('json', json.loads, _dump_json))
+    elif name == 'yaml':
+        import yaml
+        if hasattr(yaml, 'CSafeLoader'):
+            backends.append(('libyaml',
+                             lambda content: yaml.load(content, Loader=yaml.CSafeLoader),
+                             lambda config: yaml.dump(config, Dumper=yaml.CDumper).encode('utf-8')))
+        backends.append(('pyyaml',
+                         lambda content: yaml.load(content, Loader=yaml.SafeLoader),
+                         lambda config: yaml.dump(config).encode('utf-8')))
+    elif name == 'toml':
+        # tomllib only parses, writing always goes through the toml package
+        try:
+            import tomllib
+            backends.append(('tomllib', lambda content: tomllib.loads(content.decode('utf-8')), _dump_toml))
+        except ImportError:
+            pass
+        import toml
+        backends.append(('toml', lambda content: toml.loads(content.decode('utf-8')), _dump_toml))
+    elif name == 'ini':
+        backends.append(('configparser', _load_ini, _dump_ini))
+    elif name == 'msgpack':
+        backends.append(('msgpack', _load_msgpack, _dump_msgpack))
+    return backends
+
+
+for _name, _extensions in _BUILTIN_FORMATS.items():
+    for _ext in _extensions:
+        _EXTENSIONS[_ext] = _name
+
+
+def _inotify_watch(directory: Path) -> Optional[int]:
+    """Return a non-blocking inotify descriptor watching directory, or None if unavailable."""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError, TypeError):
+        return None
+    if fd < 0:
+        return None
+    mask = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+    if libc.inotify_add_watch(fd, os.fsencode(str(directory)), mask) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _diff(old: Dict[str, Any], new: Dict[str, Any], prefix: str = "",
+          result: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Dict[str, Any]]:
+    """Compare two configs, keyed by dotted path."""
+    if result is None:
+        result = {"added": {}, "removed": {}, "changed": {}}
+    for key, value in new.items():
+        path = f"{prefix}{key}"
+        if key not in old:
+            result["added"][path] = value
+        elif isinstance(value, dict) and isinstance(old[key], dict):
+            _diff(old[key], value, path + ".", result)
+        elif value != old[key]:
+            result["changed"][path] = (old[key], value)
+    for key, value in old.items():
+        if key not in new:
+            result["removed"][f"{prefix}{key}"] = value
+    return result
+
+
+_MISSING = object()
+
+
+@lru_cache(maxsize=4096)
+def _compile_path(path: str) -> Tuple[str, ...]:
+    """Split a dotted path ("db.pool.size") or JSON pointer ("/db/pool/size") into keys."""
+    if path.startswith('/'):
+        return tuple(key.replace('~1', '/').replace('~0', '~') for key in path[1:].split('/'))
+    return tuple(path.split('.')) if path else ()
+
+
+def _resolve(value: Any, keys: Tuple[str, ...], dotted: bool) -> Any:
+    """Walk keys down from value; in dotted paths, keys that contain dots themselves win over nesting."""
+    if not keys:
+        return value
+    if type(value) is ConfigSnapshot:
+        data = value._data
+        for end in range(len(keys) if dotted else 1, 0, -1):
+            key = '.'.join(keys[:end])
+            child = data.get(key, _MISSING)
+            if child is _MISSING and end == 1 and key.lstrip('-').isdigit():
+                child = data.get(int(key), _MISSING)
+            if child is not _MISSING:
+                child = _resolve(child, keys[end:], dotted)
+                if child is not _MISSING:
+                    return child
+        return _MISSING
+    key = keys[0]
+    if type(value) is tuple and key.isdigit() and int(key) < len(value):
+        return _resolve(value[int(key)], keys[1:], dotted)
+    return _MISSING
+
+
+_SCALARS = frozenset((str, int, float, bool, type(None)))
+
+
+def _copy_tree(value: Any) -> Any:
+    """
+    Deep copy of a parsed configuration. Parsers build plain dicts, lists and immutable
+    scalars, so only those containers are rebuilt; anything else goes through copy.deepcopy.
+    """
+    cls = type(value)
+    if cls is dict:
+        copied = value.copy()
+        for key, item in value.items():
+            if type(item) not in _SCALARS:
+                copied[key] = _copy_tree(item)
+        return copied
+    if cls is list:
+        return [item if type(item) in _SCALARS else _copy_tree(item) for item in value]
+    if cls in _SCALARS:
+        return value
+    return copy.deepcopy(value)
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return ConfigSnapshot(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    if isinstance(value, ConfigSnapshot):
+        return value.to_dict()
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+
+class ConfigSnapshot(Mapping):
+    """
+    Immutable view of a configuration. Nested tables are snapshots as well and lists become
+    tuples, so one snapshot can be shared by every consumer until the next reload.
+    """
+    __slots__ = ('_data', '_lookups')
+
+    def __init__(self, config: Dict[str, Any]):
+        self._data = {key: _freeze(value) for key, value in config.items()}
+        self._lookups = {}
+
+    def __getitem__(self, key: Any) -> Any:
+        return self._data[key]
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return f"ConfigSnapshot({self._data!r})"
+
+    def get(self, path: str, default: Any = None) -> Any:
+        """
+        Look up a nested value.
+
+        Args:
+            path: Literal key, dotted path ("db.pool.size") or JSON pointer ("/db/pool/size");
+                numeric parts index into lists, keys with dots (e.g. INI sections
+                like "server.main") are matched before splitting
+            default: Returned when the path doesn't exist
+        """
+        value = self._lookups.get(path, _MISSING)
+        if value is not _MISSING:
+            return value
+        value = self._data.get(path, _MISSING)
+        if value is _MISSING:
+            value = _resolve(self, _compile_path(path), not path.startswith('/'))
+            if value is _MISSING:
+                return default
+        # the snapshot never changes, so the result can be reused as is
+        self._lookups[path] = value
+        return value
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a mutable deep copy."""
+        return {key: _thaw(value) for key, value in self._data.items()}
 
 
 class ConfigUtils:
@@ -15,157 +332,168 @@ class ConfigUtils:
     in multiple formats with file locking for multi-process safety.
     """
 
-    def __init__(self, config_path: Union[str, Path], template: Optional[Dict[str, Any]] = None):
+    def __init__(self, config_path: Union[str, Path], template: Optional[Dict[str, Any]] = None,
+                 cache: bool = False):
         """
         Initialize the config utility.
 
         Args:
             config_path: Path to the configuration file
             template: Optional template for initializing new config files
+            cache: Skip locking and parsing in read() while the file is unchanged
         """
         self.config_path = Path(config_path)
         self.template = template or {}
         self.config = {}
+        self.cache = cache
+        self._stamp = None
+        self._snapshot = None
+        self._callbacks: List[ChangeCallback] = []
+        self._watch_task = None
+        # what the watcher last notified about; read() and update() reload self.config too
+        self._watched_stamp = None
+        self._watched_config: Dict[str, Any] = {}
         self.lock_path = str(self.config_path) + ".lock"
         self.lock = AsyncFileLock(
             self.lock_path, timeout=10)  # 10 seconds timeout
+        # the file lock is reentrant, so coroutines sharing this object also queue here
+        self._write_lock = asyncio.Lock()
 
     def _get_format(self) -> str:
         """Determine the file format from extension."""
         ext = self.config_path.suffix.lower()
-        match ext:
-            case '.ini' | '.inf':
-                return 'ini'
-            case '.json':
-                return 'json'
-            case '.yaml' | '.yml':
-                return 'yaml'
-            case '.toml':
-                return 'toml'
-            case _:
-                raise ValueError(f"Unsupported file format: {ext}")
-
-    async def _read_ini(self) -> Dict[str, Any]:
-        """Read INI format configuration."""
-        config = configparser.ConfigParser()
-        async with aiofiles.open(self.config_path, 'r', encoding='utf-8') as f:
-            content = await f.read()
-        config.read_string(content)
-        result = {}
-        for section in config.sections():
-            result[section] = dict(config[section])
-        return result
-
-    async def _read_json(self) -> Dict[str, Any]:
-        """Read JSON format configuration."""
-        async with aiofiles.open(self.config_path, 'r', encoding='utf-8') as f:
-            content = await f.read()
-        return dict(json.loads(content))
-
-    async def _read_yaml(self) -> Dict[str, Any]:
-        """Read YAML format configuration."""
-        async with aiofiles.open(self.config_path, 'r', encoding='utf-8') as f:
-            content = await f.read()
-        return yaml.safe_load(content)
-
-    async def _read_toml(self) -> Dict[str, Any]:
-        """Read TOML format configuration."""
-        async with aiofiles.open(self.config_path, 'r', encoding='utf-8') as f:
-            content = await f.read()
-        return toml.loads(content)
-
-    async def _write_ini(self, config: Dict[str, Any]) -> None:
-        """Write configuration in INI format."""
-        parser = configparser.ConfigParser()
-        for section, values in config.items():
-            if not isinstance(values, dict):
-                # Handle non-dict values at root level
-                if 'DEFAULT' not in parser:
-                    parser['DEFAULT'] = {}
-                parser['DEFAULT'][section] = str(values)
-                continue
-
-            parser[section] = {}
-            for key, value in values.items():
-                parser[section][key] = str(value)
-
-        async with aiofiles.open(self.config_path, 'w', encoding='utf-8') as f:
-            content = ""
-            for section in parser.sections():
-                content += f"[{section}]\n"
-                for key, value in parser[section].items():
-                    content += f"{key} = {value}\n"
-                content += "\n"
-            await f.write(content)
-
-    async def _write_json(self, config: Dict[str, Any]) -> None:
-        """Write configuration in JSON format."""
-        async with aiofiles.open(self.config_path, 'w', encoding='utf-8') as f:
-            await f.write(json.dumps(config, indent=2))
-
-    async def _write_yaml(self, config: Dict[str, Any]) -> None:
-        """Write configuration in YAML format."""
-        async with aiofiles.open(self.config_path, 'w', encoding='utf-8') as f:
-            await f.write(yaml.dump(config))
-
-    async def _write_toml(self, config: Dict[str, Any]) -> None:
-        """Write configuration in TOML format."""
-        async with aiofiles.open(self.config_path, 'w', encoding='utf-8') as f:
-            await f.write(toml.dumps(config))
+        if ext not in _EXTENSIONS:
+            raise ValueError(f"Unsupported file format: {ext}")
+        return _EXTENSIONS[ext]
+
+    def _replace_sync(self, content: bytes) -> None:
+        """Write content to a temp file, fsync it and rename it over the config file."""
+        fd, tmp = tempfile.mkstemp(dir=self.config_path.parent,
+                                   prefix=f".{self.config_path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            try:
+                mode = stat.S_IMODE(os.stat(self.config_path).st_mode)
+            except FileNotFoundError:
+                mode = 0o644
+            os.chmod(tmp, mode)
+            os.replace(tmp, self.config_path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+        try:
+            dir_fd = os.open(self.config_path.parent, os.O_RDONLY)
+        except OSError:  # directories can't be opened on windows
+            return
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+    async def _atomic_write(self, content: bytes) -> None:
+        """Replace the config file so readers only ever see a complete file."""
+        await asyncio.to_thread(self._replace_sync, content)
+
+    def _file_stamp(self) -> Optional[Tuple[int, int, int]]:
+        """Identify the current file contents by (mtime_ns, size, inode)."""
+        try:
+            st = os.stat(self.config_path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    @property
+    def snapshot(self) -> ConfigSnapshot:
+        """Immutable view of the last configuration read or saved, rebuilt only after it changes."""
+        if self._snapshot is None:
+            self._snapshot = ConfigSnapshot(self.config)
+        return self._snapshot
+
+    def get(self, path: str, default: Any = None) -> Any:
+        """Look up a dotted path or JSON pointer in the current snapshot without any I/O."""
+        return self.snapshot.get(path, default)
+
+    async def read_snapshot(self) -> ConfigSnapshot:
+        """Like read(), but returns the shared immutable snapshot instead of a copy."""
+        if not (self.cache and self._stamp is not None and self._stamp == self._file_stamp()):
+            await self.read()
+        return self.snapshot
 
     async def read(self) -> Dict[str, Any]:
         """
-        Read configuration from file with proper locking.
+        Read configuration from file.
         If file doesn't exist but template is provided, initializes with template.
+        Writers replace the file atomically, so reading never has to wait for the lock.
+        With caching enabled, an unchanged file is served from memory without parsing,
+        as a copy the caller may modify; read_snapshot() skips the copy.
         """
-        async with self.lock:
-            if not self.config_path.exists():
-                if self.template:
-                    await self.save(self.template)
-                    return self.template.copy()
-                else:
-                    return {}
+        if self.cache and self._stamp is not None and self._stamp == self._file_stamp():
+            return _copy_tree(self.config)
+        if not self.config_path.exists() and self.template:
+            self.config_path.parent.mkdir(parents=True, exist_ok=True)
+            async with self._write_lock, self.lock:
+                # another writer may have created it while we waited
+                if not self.config_path.exists():
+                    await self._save_unlocked(copy.deepcopy(self.template))
+                    return copy.deepcopy(self.template)
+        return await self._load()
 
-            file_format = self._get_format()
-            try:
-                if file_format == 'ini':
-                    self.config = await self._read_ini()
-                elif file_format == 'json':
-                    self.config = await self._read_json()
-                elif file_format == 'yaml':
-                    self.config = await self._read_yaml()
-                elif file_format == 'toml':
-                    self.config = await self._read_toml()
-                return self.config.copy()
-            except Exception as e:
-                raise RuntimeError(
-                    f"Failed to read config file {self.config_path}: {str(e)}")
+    async def _load(self) -> Dict[str, Any]:
+        if not self.config_path.exists():
+            self.config = {}
+            self._snapshot = None
+            return {}
+
+        loads, _ = get_codec(self._get_format())
+        try:
+            # stat first: if the file changes while we parse, the next read parses again
+            stamp = self._file_stamp()
+            async with aiofiles.open(self.config_path, 'rb') as f:
+                content = await f.read()
+            self.config = loads(content)
+            self._snapshot = None
+            self._stamp = stamp
+            return _copy_tree(self.config)
+        except Exception as e:
+            raise RuntimeError(
+                f"Failed to read config file {self.config_path}: {str(e)}")
 
     async def save(self, config: Dict[str, Any]) -> None:
         """Save configuration to file with proper locking."""
-        self.config = config
         self.config_path.parent.mkdir(parents=True, exist_ok=True)
+        async with self._write_lock, self.lock:
+            await self._save_unlocked(config)
 
-        async with self.lock:
-            file_format = self._get_format()
-            try:
-                if file_format == 'ini':
-                    await self._write_ini(config)
-                elif file_format == 'json':
-                    await self._write_json(config)
-                elif file_format == 'yaml':
-                    await self._write_yaml(config)
-                elif file_format == 'toml':
-                    await self._write_toml(config)
-            except Exception as e:
-                raise RuntimeError(
-                    f"Failed to save config to {self.config_path}: {str(e)}")
+    async def _save_unlocked(self, config: Dict[str, Any]) -> None:
+        self.config = config
+        self._snapshot = None
+        _, dumps = get_codec(self._get_format())
+        try:
+            await self._atomic_write(dumps(config))
+            self._stamp = self._file_stamp()
+        except Exception as e:
+            raise RuntimeError(
+                f"Failed to save config to {self.config_path}: {str(e)}")
 
     async def update(self, new_config: Dict[str, Any]) -> None:
-        """Update configuration with new values and save to file."""
-        current = await self.read()
-        self._deep_update(current, new_config)
-        await self.save(current)
+        """
+        Update configuration with new values and save to file.
+        The lock is held from reading to saving, so concurrent updates never overwrite each other.
+        """
+        self.config_path.parent.mkdir(parents=True, exist_ok=True)
+        async with self._write_lock, self.lock:
+            if not self.config_path.exists() and self.template:
+                current = copy.deepcopy(self.template)
+            else:
+                current = await self._load()
+            self._deep_update(current, new_config)
+            await self._save_unlocked(current)
 
     def _deep_update(self, target: Dict[str, Any], source: Dict[str, Any]) -> None:
         """Recursively update nested dictionary."""
@@ -174,3 +502,98 @@ class ConfigUtils:
                 self._deep_update(target[key], value)
             else:
                 target[key] = value
+
+    def on_change(self, callback: ChangeCallback) -> None:
+        """
+        Register a callback for changes of the file seen by the watcher, including
+        ones that read() or update() loaded first.
+
+        Args:
+            callback: Called (or awaited) with the new config and a diff of
+                dotted paths: {"added": {...}, "removed": {...}, "changed": {path: (old, new)}}
+        """
+        self._callbacks.append(callback)
+
+    async def watch(self, interval: float = 1.0) -> None:
+        """
+        Start reloading the file in the background whenever it changes.
+        Uses inotify where available and falls back to polling the file's stat.
+
+        Args:
+            interval: Polling interval in seconds when inotify is unavailable
+        """
+        if self._watch_task is None:
+            loop = asyncio.get_running_loop()
+            changed = asyncio.Event()
+            # watch before the first reload so no change can slip in between
+            fd = _inotify_watch(self.config_path.parent)
+            if fd is not None:
+                def drain():
+                    try:
+                        while os.read(fd, 4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    changed.set()
+                try:
+                    loop.add_reader(fd, drain)
+                except NotImplementedError:
+                    os.close(fd)
+                    fd = None
+            self._watch_task = loop.create_task(self._watch(fd, changed, interval))
+            # changes already read before watching are not reported
+            self._watched_stamp = self._stamp
+            self._watched_config = _copy_tree(self.config)
+            await self._reload()
+
+    async def unwatch(self) -> None:
+        """Stop the background watcher."""
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+    async def _watch(self, fd: Optional[int], changed: asyncio.Event, interval: float) -> None:
+        try:
+            while True:
+                if fd is not None:
+                    await changed.wait()
+                    changed.clear()
+                else:
+                    await asyncio.sleep(interval)
+                await self._reload()
+        finally:
+            if fd is not None:
+                asyncio.get_running_loop().remove_reader(fd)
+                os.close(fd)
+
+    async def _reload(self) -> None:
+        stamp = self._file_stamp()
+        if self._watched_stamp is not None and self._watched_stamp == stamp:
+            return
+        if self._stamp is not None and self._stamp == stamp:
+            # already loaded by read(), update() or save()
+            new = _copy_tree(self.config)
+        else:
+            try:
+                new = await self._load()
+            except Exception as e:
+                # keep serving the last good config, a half-written file will be retried
+                sys.stderr.write(f"Failed to reload config file {self.config_path}: {e}\n")
+                return
+        old = self._watched_config
+        self._watched_stamp = stamp
+        self._watched_config = new
+        diff = _diff(old, new)
+        if not any(diff.values()):
+            return
+        for callback in self._callbacks:
+            try:
+                result = callback(new, diff)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                sys.stderr.write(f"Config change callback failed for {self.config_path}: {e}\n")
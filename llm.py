@@ -1,7 +1,695 @@
-from httpx import Client, Timeout, URL
-from openai import DEFAULT_MAX_RETRIES, NotGiven, NOT_GIVEN, OpenAI, Stream
-from openai.types.chat import ChatCompletion, ChatCompletionChunk
-from typing import Dict, List, Mapping, Optional, Union
+import asyncio
+import contextvars
+import copy
+import hashlib
+import inspect
+import json
+import math
+import random
+import sqlite3
+import sys
+import threading
+import time
+
+from collections import OrderedDict
+from collections.abc import Mapping as MappingABC
+from httpx import AsyncClient, Limits, Timeout, URL
+from openai import (
+    APIConnectionError, APITimeoutError, AsyncOpenAI, DEFAULT_MAX_RETRIES, DefaultAsyncHttpxClient,
+    InternalServerError, NotGiven, NOT_GIVEN, RateLimitError
+)
+from openai.types.chat import ChatCompletion, ChatCompletionChunk, ChatCompletionMessage
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, List, Mapping, Optional, Tuple, Union
+
+try:
+    from ._fanout import fan_out
+except ImportError:  # used as flat modules
+    from _fanout import fan_out
+
+# request options that don't change the answer, left out of the cache key
+_UNCACHED_PARAMS = {"timeout", "extra_headers", "extra_query", "user"}
+# chat_many swaps in a client without automatic retries for its own tasks,
+# so it sees 429s itself instead of stacking retries on top of the client's
+_client_override: contextvars.ContextVar = contextvars.ContextVar("client_override", default=None)
+# metrics of the call running in this task, read by the http trace hook
+_current_call: contextvars.ContextVar = contextvars.ContextVar("current_call", default=None)
+# when chat_many queued the current request, so queue_wait covers its budgets
+_queued_at: contextvars.ContextVar = contextvars.ContextVar("queued_at", default=None)
+_CONNECT_EVENTS = ("connection.connect_tcp", "connection.connect_unix_socket", "connection.start_tls")
+
+
+def _to_json(value: Any) -> Any:
+    # pydantic objects in the normalized responses (tool_calls) and stream chunks
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    return str(value)
+
+
+class _DeltaView(MappingABC):
+    """The "delta" entry of a ChoiceDelta, built only when read through the mapping view."""
+
+    __slots__ = ("_choice",)
+
+    def __init__(self, choice: "ChoiceDelta"):
+        self._choice = choice
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "role" or key == "content" or (key == "tool_calls" and self._choice.tool_calls):
+            return getattr(self._choice, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(("role", "content", "tool_calls") if self._choice.tool_calls else ("role", "content"))
+
+    def __len__(self) -> int:
+        return 3 if self._choice.tool_calls else 2
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+class ChoiceDelta(MappingABC):
+    """One choice of a StreamChunk, readable as {"index", "delta": {"role", "content"}, "finish_reason"}."""
+
+    __slots__ = ("index", "role", "content", "finish_reason", "tool_calls")
+    _KEYS = ("index", "delta", "finish_reason")
+
+    def __init__(self, index: int, role: Optional[str], content: Optional[str],
+                 finish_reason: Optional[str], tool_calls: Optional[List[Dict[str, Any]]] = None):
+        self.index = index
+        self.role = role
+        self.content = content
+        self.finish_reason = finish_reason
+        self.tool_calls = tool_calls
+
+    def __deepcopy__(self, memo) -> "ChoiceDelta":
+        return self  # shared read-only, see StreamChunk
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "delta":
+            return _DeltaView(self)
+        if key == "index" or key == "finish_reason":
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._KEYS)
+
+    def __len__(self) -> int:
+        return 3
+
+    def __repr__(self) -> str:
+        return repr(self.to_dict())
+
+    def to_dict(self) -> Dict[str, Any]:
+        delta = {"role": self.role, "content": self.content}
+        if self.tool_calls:
+            delta["tool_calls"] = copy.deepcopy(self.tool_calls)
+        return {"index": self.index, "delta": delta, "finish_reason": self.finish_reason}
+
+
+class StreamChunk(MappingABC):
+    """
+    Normalized stream chunk, also readable as the read-only mapping
+    {"id", "model", "choices"[, "usage"]} of the dict shape. Chunks are
+    shared between the readers of a cached or in-flight stream; to_dict()
+    gives a plain (e.g. JSON serializable) copy.
+    """
+
+    __slots__ = ("id", "model", "created", "choices", "usage")
+
+    def __init__(self, id: str, model: str, choices: List[ChoiceDelta],
+                 usage: Optional[Dict[str, int]] = None, created: Optional[int] = None):
+        self.id = id
+        self.model = model
+        self.created = created
+        self.choices = choices
+        self.usage = usage
+
+    def __deepcopy__(self, memo) -> "StreamChunk":
+        return self
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "id" or key == "model" or key == "choices" or (key == "usage" and self.usage is not None):
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(("id", "model", "choices", "usage") if self.usage is not None else ("id", "model", "choices"))
+
+    def __len__(self) -> int:
+        return 3 if self.usage is None else 4
+
+    def __repr__(self) -> str:
+        return repr(self.to_dict())
+
+    def to_dict(self) -> Dict[str, Any]:
+        chunk = {"id": self.id, "model": self.model, "choices": [choice.to_dict() for choice in self.choices]}
+        if self.usage is not None:
+            chunk["usage"] = dict(self.usage)
+        return chunk
+
+    @classmethod
+    def from_dict(cls, chunk: Mapping[str, Any]) -> "StreamChunk":
+        return cls(chunk["id"], chunk["model"], [
+            ChoiceDelta(choice["index"], choice["delta"].get("role"), choice["delta"].get("content"),
+                        choice.get("finish_reason"), choice["delta"].get("tool_calls"))
+            for choice in chunk["choices"]
+        ], chunk.get("usage"), chunk.get("created"))
+
+
+class StreamAccumulator(object):
+    """
+    Builds the chatNoStream-shaped response while a stream is consumed:
+    content and tool call argument deltas are buffered per choice and joined
+    once in result().
+    """
+
+    __slots__ = ("id", "model", "created", "usage", "_choices")
+
+    def __init__(self):
+        self.id: Optional[str] = None
+        self.model: Optional[str] = None
+        self.created: Optional[int] = None
+        self.usage: Optional[Dict[str, int]] = None
+        # index -> [role, content parts, {tool index: [id, type, name, argument parts]}, finish_reason]
+        self._choices: Dict[int, list] = {}
+
+    def add(self, chunk: Union[StreamChunk, Dict[str, Any]]):
+        if type(chunk) is dict:
+            chunk = StreamChunk.from_dict(chunk)
+        if self.id is None:
+            self.id = chunk.id
+            self.model = chunk.model
+            self.created = chunk.created
+        if chunk.usage is not None:
+            self.usage = chunk.usage
+        choices = self._choices
+        for choice in chunk.choices:
+            state = choices.get(choice.index)
+            if state is None:
+                state = choices[choice.index] = [None, [], {}, None]
+            if choice.role:
+                state[0] = choice.role
+            if choice.content:
+                state[1].append(choice.content)
+            if choice.finish_reason:
+                state[3] = choice.finish_reason
+            if choice.tool_calls:
+                tools = state[2]
+                for call in choice.tool_calls:
+                    tool = tools.get(call["index"])
+                    if tool is None:
+                        tool = tools[call["index"]] = [None, "function", None, []]
+                    function = call.get("function") or {}
+                    if call.get("id"):
+                        tool[0] = call["id"]
+                    if call.get("type"):
+                        tool[1] = call["type"]
+                    if function.get("name"):
+                        tool[2] = function["name"]
+                    if function.get("arguments"):
+                        tool[3].append(function["arguments"])
+
+    @property
+    def text(self) -> str:
+        """Content of the first choice so far."""
+        choices = self._choices
+        return "".join(choices[min(choices)][1]) if choices else ""
+
+    def result(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "object": "chat.completion",
+            "created": self.created,
+            "model": self.model,
+            "choices": [
+                {
+                    "index": index,
+                    "message": {
+                        "role": role,
+                        "content": "".join(parts) if parts else None,
+                        "tool_calls": [
+                            {"id": tool[0], "type": tool[1],
+                             "function": {"name": tool[2], "arguments": "".join(tool[3])}}
+                            for _, tool in sorted(tools.items())
+                        ] or None
+                    },
+                    "finish_reason": finish_reason
+                } for index, (role, parts, tools, finish_reason) in sorted(self._choices.items())
+            ],
+            "usage": self.usage
+        }
+
+
+def _revive(value: Any) -> Any:
+    # sqlite keeps JSON; rebuild the pydantic tool calls a fresh response carries
+    if type(value) is dict:
+        for choice in value.get("choices", ()):
+            message = choice.get("message")
+            if message and message.get("tool_calls"):
+                message["tool_calls"] = ChatCompletionMessage.model_validate(message).tool_calls
+    return value
+
+
+class _ResponseCache(object):
+    """LRU of normalized responses with a TTL, optionally backed by sqlite."""
+
+    def __init__(self, max_size: int, ttl: Optional[float], path: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "shared": 0}
+        self._db = None
+        self._db_lock = threading.Lock()
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, created REAL, value TEXT)")
+            self._db.commit()
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    async def get(self, key: str) -> Any:
+        entry = self.entries.get(key)
+        if entry is not None:
+            if not self._expired(entry[0]):
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return copy.deepcopy(entry[1])
+            del self.entries[key]
+        if self._db is not None:
+            row = await asyncio.to_thread(self._db_get, key)
+            if row is not None and not self._expired(row[0]):
+                value = _revive(json.loads(row[1]))
+                self._remember(key, row[0], value)
+                self.stats["disk_hits"] += 1
+                return copy.deepcopy(value)
+        return None
+
+    async def put(self, key: str, value: Any):
+        created = time.time()
+        self._remember(key, created, value)
+        if self._db is not None:
+            await asyncio.to_thread(self._db_put, key, created, json.dumps(value, default=_to_json))
+
+    def _remember(self, key: str, created: float, value: Any):
+        self.entries[key] = (created, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def _db_get(self, key: str) -> Optional[Tuple[float, str]]:
+        with self._db_lock:
+            return self._db.execute("SELECT created, value FROM responses WHERE key = ?", (key,)).fetchone()
+
+    def _db_put(self, key: str, created: float, value: str):
+        with self._db_lock:
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?)", (key, created, value))
+            self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+            self._db = None
+
+
+class _StreamFlight(object):
+    """Chunks of one upstream stream, replayable by any number of readers while it runs."""
+
+    def __init__(self):
+        self.chunks: List[StreamChunk] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._changed = asyncio.Event()
+
+    def push(self, chunk: StreamChunk):
+        self.chunks.append(chunk)
+        self._wake()
+
+    def finish(self, error: Optional[BaseException] = None):
+        self.done = True
+        self.error = error
+        self._wake()
+
+    def _wake(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def replay(self) -> AsyncIterator[StreamChunk]:
+        position = 0
+        while True:
+            changed = self._changed
+            while position < len(self.chunks):
+                yield self.chunks[position]
+                position += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+
+class CallMetrics(object):
+    """Timings (seconds, monotonic clock) and token counts of one chat call."""
+
+    __slots__ = ("model", "stream", "error", "aborted", "started", "request_sent", "connect", "first_chunk",
+                 "ended", "chunk_gaps", "prompt_tokens", "completion_tokens", "_last_chunk", "_connect_started")
+
+    def __init__(self, model: str, stream: bool):
+        self.model = model
+        self.stream = stream
+        self.error: Optional[str] = None
+        # the consumer stopped iterating the stream before it ended
+        self.aborted = False
+        self.started = _queued_at.get() or time.monotonic()
+        self.request_sent: Optional[float] = None
+        self.connect = 0.0
+        self.first_chunk: Optional[float] = None
+        self.ended: Optional[float] = None
+        self.chunk_gaps: List[float] = []
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        self._last_chunk = 0.0
+        self._connect_started = 0.0
+
+    async def _trace(self, event: str, info: Dict[str, Any]):
+        # httpcore trace callback; connect is 0 when a pooled connection was reused
+        now = time.monotonic()
+        if event.startswith(_CONNECT_EVENTS):
+            if event.endswith(".started"):
+                self._connect_started = now
+            elif event.endswith(".complete"):
+                self.connect += now - self._connect_started
+        elif event.endswith("send_request_headers.started"):
+            if self.request_sent is None:
+                self.request_sent = now
+        elif event.endswith("receive_response_headers.complete") and not self.stream:
+            if self.first_chunk is None:
+                self.first_chunk = now
+
+    def chunk(self, has_content: bool):
+        now = time.monotonic()
+        if self.first_chunk is None:
+            self.first_chunk = now
+        else:
+            self.chunk_gaps.append(now - self._last_chunk)
+        self._last_chunk = now
+        if has_content:
+            # one content delta is about one token when usage isn't streamed
+            self.completion_tokens = (self.completion_tokens or 0) + 1
+
+    @property
+    def cached(self) -> bool:
+        """Answered without a request of its own (cache hit or shared in-flight call)."""
+        return self.request_sent is None and self.error is None
+
+    @property
+    def queue_wait(self) -> Optional[float]:
+        if self.request_sent is None:
+            return None
+        return max(0.0, self.request_sent - self.started - self.connect)
+
+    @property
+    def time_to_first_chunk(self) -> Optional[float]:
+        if self.first_chunk is None:
+            return None
+        return self.first_chunk - (self.request_sent or self.started)
+
+    @property
+    def duration(self) -> Optional[float]:
+        return None if self.ended is None else self.ended - self.started
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        start = self.first_chunk if self.stream else self.request_sent
+        if not self.completion_tokens or start is None or self.ended is None or self.ended <= start:
+            return None
+        return self.completion_tokens / (self.ended - start)
+
+    def inter_chunk(self, q: float) -> Optional[float]:
+        """q-th percentile (0-100) of the gaps between streamed chunks."""
+        if not self.chunk_gaps:
+            return None
+        gaps = sorted(self.chunk_gaps)
+        return gaps[min(len(gaps) - 1, int(len(gaps) * q / 100))]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "stream": self.stream,
+            "cached": self.cached,
+            "error": self.error,
+            "aborted": self.aborted,
+            "queue_wait": self.queue_wait,
+            "connect": self.connect,
+            "time_to_first_chunk": self.time_to_first_chunk,
+            "inter_chunk_p50": self.inter_chunk(50),
+            "inter_chunk_p90": self.inter_chunk(90),
+            "inter_chunk_p99": self.inter_chunk(99),
+            "duration": self.duration,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "tokens_per_second": self.tokens_per_second
+        }
+
+
+class _Histogram(object):
+    # log-spaced buckets 12% wide from 10us, enough for seconds and tokens/s alike
+    __slots__ = ("counts", "count", "total", "max")
+    _BASE = 1e-5
+    _LOG_GROWTH = math.log(1.12)
+    _BUCKETS = 240
+
+    def __init__(self):
+        self.counts = [0] * self._BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float):
+        if value <= self._BASE:
+            index = 0
+        else:
+            index = min(self._BUCKETS - 1, int(math.log(value / self._BASE) / self._LOG_GROWTH) + 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q: float) -> float:
+        rank = self.count * q / 100
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                # upper bound of the bucket, capped by the largest value seen
+                return min(self.max, self._BASE * math.exp(index * self._LOG_GROWTH))
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean": self.total / self.count,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max
+        }
+
+
+class LLMMetrics(object):
+    """In-process aggregate of CallMetrics."""
+
+    FIELDS = ("queue_wait", "connect", "time_to_first_chunk", "inter_chunk", "duration", "tokens_per_second")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.histograms = {field: _Histogram() for field in self.FIELDS}
+        self.calls = 0
+        self.errors = 0
+        self.aborted = 0
+        self.cached = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def record(self, call: CallMetrics):
+        self.calls += 1
+        if call.error is not None:
+            self.errors += 1
+        elif call.cached:
+            self.cached += 1
+        if call.aborted:
+            self.aborted += 1
+        self.prompt_tokens += call.prompt_tokens or 0
+        self.completion_tokens += call.completion_tokens or 0
+        histograms = self.histograms
+        if call.request_sent is not None:
+            histograms["queue_wait"].add(call.queue_wait)
+            histograms["connect"].add(call.connect)
+        # an aborted stream's duration says how long the consumer read, not how long the call takes
+        for field in ("time_to_first_chunk",) if call.aborted else ("time_to_first_chunk", "duration",
+                                                                     "tokens_per_second"):
+            value = getattr(call, field)
+            if value is not None:
+                histograms[field].add(value)
+        add = histograms["inter_chunk"].add
+        for gap in call.chunk_gaps:
+            add(gap)
+
+    def summary(self) -> Dict[str, Any]:
+        summary: Dict[str, Any] = {
+            "calls": self.calls,
+            "errors": self.errors,
+            "aborted": self.aborted,
+            "cached": self.cached,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens
+        }
+        for field, histogram in self.histograms.items():
+            summary[field] = histogram.summary()
+        return summary
+
+
+class LoggerExporter(object):
+    """on_metrics callback writing every call through a logs.Logger (or BoundLogger)."""
+
+    def __init__(self, logger: Any, level: Any = None,
+                 message: Optional[str] = "llm {model} ttfc={time_to_first_chunk} "
+                                          "duration={duration} tokens/s={tokens_per_second}"):
+        if level is None:
+            try:
+                from .logs import Levels
+            except ImportError:  # used as a flat module
+                from logs import Levels
+            level = Levels.INFO
+        self.logger = logger
+        self.level = level
+        self.message = message
+
+    async def __call__(self, call: CallMetrics):
+        await self.logger.log(self.level, self.message, **call.to_dict())
+
+
+class _TokenBucket(object):
+    """Budget of per_minute units refilled continuously; callers wait in order for their share."""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def take(self, amount: float):
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def credit(self, amount: float):
+        """Give back (or, negative, take) the difference between estimate and actual use."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class _AdaptiveLimiter(object):
+    """
+    Concurrency limit that grows by one per limit successes, halves on 429
+    and holds every new request back until Retry-After has passed. It also
+    shrinks by 10% when the recent latency per completion token stays above
+    twice its long-run average for sustain successes in a row.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1, sustain: int = 10):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.sustain = sustain
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        # seconds per completion token: recent (fast EWMA) and long-run (slow EWMA)
+        self.latency: Optional[float] = None
+        self.baseline_latency: Optional[float] = None
+        self._slow = 0
+        self._changed = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._changed:
+            while True:
+                pause = self.paused_until - time.monotonic()
+                if pause > 0:
+                    try:
+                        await asyncio.wait_for(self._changed.wait(), pause)
+                    except asyncio.TimeoutError:
+                        pass
+                elif self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                else:
+                    await self._changed.wait()
+
+    async def release(self):
+        async with self._changed:
+            self.in_flight -= 1
+            self._changed.notify_all()
+
+    def succeeded(self, latency: float, completion_tokens: Optional[int] = None):
+        # per token, so long answers do not read as congestion
+        latency /= max(1, completion_tokens or 1)
+        if self.latency is None:
+            self.latency = self.baseline_latency = latency
+        else:
+            self.latency = 0.8 * self.latency + 0.2 * latency
+            self.baseline_latency = 0.98 * self.baseline_latency + 0.02 * latency
+        if self.latency > 2 * self.baseline_latency:
+            self._slow += 1
+            if self._slow >= self.sustain:
+                self._slow = 0
+                self.limit = max(self.min_limit, self.limit * 0.9)
+            return
+        self._slow = 0
+        self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def throttled(self, retry_after: float):
+        self.limit = max(self.min_limit, self.limit / 2)
+        self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+
+def _retry_after(error: RateLimitError, attempt: int) -> float:
+    headers = error.response.headers if error.response is not None else {}
+    for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        try:
+            return float(headers[header]) * scale
+        except (KeyError, ValueError):
+            pass
+    return min(60.0, 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+def _estimate_tokens(messages: List[Dict[str, Any]], params: Dict[str, Any]) -> int:
+    # ~4 characters per token plus per-message overhead; the completion budget
+    # counts against TPM up front like it does upstream
+    prompt = sum(4 + len(str(message.get("content") or "")) // 4 for message in messages)
+    return prompt + (params.get("max_completion_tokens") or params.get("max_tokens") or 0)
 
 
 class OpenAILLM:
@@ -17,9 +705,29 @@ class OpenAILLM:
                  max_retries: Optional[int] = DEFAULT_MAX_RETRIES,
                  default_headers: Optional[Mapping[str, str]] = None,
                  default_query: Optional[Mapping[str, object]] = None,
-                 http_client: Optional[Client] = None,
+                 http_client: Optional[AsyncClient] = None,
+                 max_connections: Optional[int] = 100,
+                 max_keepalive_connections: Optional[int] = 20,
+                 keepalive_expiry: Optional[float] = 30.0,
+                 http2: Optional[bool] = False,
+                 cache: Optional[bool] = False,
+                 cache_size: Optional[int] = 1024,
+                 cache_ttl: Optional[float] = 3600.0,
+                 cache_path: Optional[str] = None,
+                 metrics: Optional[bool] = False,
+                 compact_chunks: Optional[bool] = False,
                  _strict_response_validation: Optional[bool] = False):
-        self.model = OpenAI(
+        # every request shares one pooled async http client; http2 needs the h2 package
+        self._owns_http_client = http_client is None
+        if http_client is None:
+            http_client = DefaultAsyncHttpxClient(
+                limits=Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_keepalive_connections,
+                    keepalive_expiry=keepalive_expiry),
+                http2=http2)
+        self.http_client = http_client
+        self.model = AsyncOpenAI(
             base_url=base_url,
             api_key=api_key,
             organization=organization,
@@ -33,27 +741,325 @@ class OpenAILLM:
             _strict_response_validation=_strict_response_validation
         )
         self.default_model_name = default_model_name
+        # identical requests (model, messages and sampling parameters) are
+        # answered from memory, or from sqlite at cache_path across restarts;
+        # concurrent identical requests share one upstream call
+        self._cache = _ResponseCache(cache_size, cache_ttl, cache_path) if cache else None
+        self._flights: Dict[str, Union[asyncio.Future, _StreamFlight]] = {}
+        self._flight_tasks = set()
+        self._no_retry_model = None
+        # chatStream yields the shared StreamChunk objects (read-only mappings of the
+        # same shape) instead of building a dict per chunk
+        self.compact_chunks = compact_chunks
+        # per-call timings, aggregated in self.metrics and handed to on_metrics callbacks
+        self.metrics: Optional[LLMMetrics] = None
+        self._metrics_callbacks: List[Any] = []
+        self._metrics_tasks = set()
+        if metrics:
+            self._enable_metrics()
+
+    def _enable_metrics(self):
+        if self.metrics is None:
+            self.metrics = LLMMetrics()
+            self.http_client.event_hooks["request"].append(self._trace_request)
+
+    def on_metrics(self, callback: Any):
+        """Call callback(CallMetrics) after every chat call; async callbacks run as tasks."""
+        self._enable_metrics()
+        self._metrics_callbacks.append(callback)
+
+    async def _trace_request(self, request):
+        call = _current_call.get()
+        if call is not None:
+            request.extensions["trace"] = call._trace
+
+    def _finish_call(self, call: CallMetrics):
+        call.ended = time.monotonic()
+        self.metrics.record(call)
+        for callback in self._metrics_callbacks:
+            try:
+                result = callback(call)
+                if inspect.isawaitable(result):
+                    task = asyncio.ensure_future(result)
+                    self._metrics_tasks.add(task)
+                    task.add_done_callback(self._metrics_done)
+            except Exception as e:
+                sys.stderr.write(f"LLM metrics callback failed: {e}\n")
+
+    def _metrics_done(self, task: asyncio.Task):
+        self._metrics_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            sys.stderr.write(f"LLM metrics callback failed: {task.exception()}\n")
+
+    @property
+    def cache_stats(self) -> Dict[str, int]:
+        return dict(self._cache.stats) if self._cache is not None else {}
+
+    async def aclose(self):
+        if self._flight_tasks:
+            await asyncio.gather(*self._flight_tasks, return_exceptions=True)
+        if self._metrics_tasks:
+            await asyncio.gather(*self._metrics_tasks, return_exceptions=True)
+        if self._cache is not None:
+            self._cache.close()
+        if self._owns_http_client:
+            await self.model.close()
+
+    async def __aenter__(self) -> "OpenAILLM":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    def _cache_key(self, model: str, messages: List[Dict[str, str]], stream: bool, kwargs: Dict[str, Any]) -> str:
+        request = {key: value for key, value in kwargs.items() if key not in _UNCACHED_PARAMS}
+        request.update(model=model, messages=messages, stream=stream)
+        canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=_to_json)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _track(self, task: asyncio.Task):
+        self._flight_tasks.add(task)
+        task.add_done_callback(self._flight_tasks.discard)
 
     async def chatStream(self, messages: List[Dict[str, str]], model: Optional[str] = None, **kwargs):
-        completion_result = self.model.chat.completions.create(
+        compact = self.compact_chunks
+        if self.metrics is None:
+            async for response_shard in self._cached_stream(messages, model, **kwargs):
+                yield response_shard if compact else response_shard.to_dict()
+            return
+        call = CallMetrics(model or self.default_model_name, True)
+        token = _current_call.set(call)
+        try:
+            async for response_shard in self._cached_stream(messages, model, **kwargs):
+                call.chunk(any(choice.content for choice in response_shard.choices))
+                if response_shard.usage is not None:
+                    call.prompt_tokens = response_shard.usage.get("prompt_tokens")
+                    call.completion_tokens = response_shard.usage.get("completion_tokens")
+                yield response_shard if compact else response_shard.to_dict()
+        except GeneratorExit:
+            call.aborted = True
+            raise
+        except BaseException as e:
+            call.error = type(e).__name__
+            raise
+        finally:
+            try:
+                _current_call.reset(token)
+            except ValueError:  # closed from another context (e.g. garbage collected)
+                pass
+            self._finish_call(call)
+
+    async def _cached_stream(self, messages: List[Dict[str, str]], model: Optional[str] = None, **kwargs):
+        if self._cache is None:
+            async for response_shard in self._create_stream(messages, model, **kwargs):
+                yield response_shard
+            return
+        key = self._cache_key(model or self.default_model_name, messages, True, kwargs)
+        flight = self._flights.get(key)
+        if flight is not None:
+            self._cache.stats["shared"] += 1
+        else:
+            chunks = await self._cache.get(key)
+            if chunks is not None:
+                for response_shard in chunks:
+                    # the disk tier hands back dicts
+                    yield StreamChunk.from_dict(response_shard) if type(response_shard) is dict else response_shard
+                return
+            flight = self._flights.get(key)  # started while we checked the disk tier
+            if flight is not None:
+                self._cache.stats["shared"] += 1
+            else:
+                self._cache.stats["misses"] += 1
+                flight = self._flights[key] = _StreamFlight()
+                self._track(asyncio.get_running_loop().create_task(
+                    self._fill_stream(key, flight, messages, model, kwargs)))
+        async for response_shard in flight.replay():
+            yield response_shard
+
+    async def _fill_stream(self, key: str, flight: _StreamFlight, messages: List[Dict[str, str]],
+                           model: Optional[str], kwargs: Dict[str, Any]):
+        # runs to the end even if every reader stops early, so the answer is cached
+        try:
+            async for response_shard in self._create_stream(messages, model, **kwargs):
+                flight.push(response_shard)
+            await self._cache.put(key, flight.chunks)
+            flight.finish()
+        except BaseException as e:
+            flight.finish(e)
+        finally:
+            self._flights.pop(key, None)
+
+    async def _create_stream(self, messages: List[Dict[str, str]], model: Optional[str] = None, **kwargs):
+        completion_result = await (_client_override.get() or self.model).chat.completions.create(
             model=model if model else self.default_model_name,
             messages=messages,
             stream=True,
             **kwargs
         )
-        for shard in completion_result:
-            response_shard = await self._standard_stream_response(shard)
-            yield response_shard
+        try:
+            async for shard in completion_result:
+                yield self._standard_stream_response(shard)
+        finally:
+            # release the connection even if the caller stops early
+            await completion_result.close()
         return
 
     async def chatNoStream(self, messages: List[Dict[str, str]], model: Optional[str] = None, **kwargs):
-        completion_result = self.model.chat.completions.create(
+        if self.metrics is None:
+            return await self._cached_no_stream(messages, model, **kwargs)
+        call = CallMetrics(model or self.default_model_name, False)
+        token = _current_call.set(call)
+        try:
+            response = await self._cached_no_stream(messages, model, **kwargs)
+            usage = response.get("usage") or {}
+            call.prompt_tokens = usage.get("prompt_tokens")
+            call.completion_tokens = usage.get("completion_tokens")
+            return response
+        except BaseException as e:
+            call.error = type(e).__name__
+            raise
+        finally:
+            _current_call.reset(token)
+            self._finish_call(call)
+
+    async def _cached_no_stream(self, messages: List[Dict[str, str]], model: Optional[str] = None, **kwargs):
+        if self._cache is None:
+            return await self._create_no_stream(messages, model, **kwargs)
+        key = self._cache_key(model or self.default_model_name, messages, False, kwargs)
+        flight = self._flights.get(key)
+        if flight is None:
+            response = await self._cache.get(key)
+            if response is not None:
+                return response
+            flight = self._flights.get(key)
+        if flight is None:
+            self._cache.stats["misses"] += 1
+            flight = self._flights[key] = asyncio.get_running_loop().create_task(
+                self._fill_no_stream(key, messages, model, kwargs))
+            self._track(flight)
+        else:
+            self._cache.stats["shared"] += 1
+        # a caller that gives up must not cancel the request for the others
+        return copy.deepcopy(await asyncio.shield(flight))
+
+    async def _fill_no_stream(self, key: str, messages: List[Dict[str, str]],
+                              model: Optional[str], kwargs: Dict[str, Any]):
+        try:
+            response = await self._create_no_stream(messages, model, **kwargs)
+            await self._cache.put(key, response)
+            return response
+        finally:
+            self._flights.pop(key, None)
+
+    async def _create_no_stream(self, messages: List[Dict[str, str]], model: Optional[str] = None, **kwargs):
+        completion_result = await (_client_override.get() or self.model).chat.completions.create(
             model=model if model else self.default_model_name,
             messages=messages,
             stream=False,
             **kwargs
         )
-        return await self._standard_no_stream_response(completion_result)
+        return self._standard_no_stream_response(completion_result)
+
+    async def chat_many(self, requests: Union[Iterable[Any], AsyncIterable[Any]],
+                        model: Optional[str] = None,
+                        rpm: Optional[float] = None,
+                        tpm: Optional[float] = None,
+                        max_concurrency: Optional[int] = 16,
+                        max_attempts: Optional[int] = 5,
+                        stats: Optional[Dict[str, Any]] = None,
+                        **kwargs) -> AsyncIterator[Tuple[int, Optional[Dict[str, Any]], Optional[Exception]]]:
+        """
+        Run many non-streamed chats, yielding (index, response, None) or
+        (index, None, error) as they finish; index is the request's position
+        in requests. A request is a messages list or a dict with "messages"
+        and per-request overrides of model/kwargs.
+
+        rpm and tpm are client-side budgets per minute; tokens are estimated
+        before each call and corrected from usage after it. Concurrency adapts
+        up to max_concurrency from latency and 429s (honoring Retry-After);
+        rate limits, timeouts and 5xx are retried up to max_attempts times.
+        stats, if given, is kept up to date.
+        """
+        if stats is None:
+            stats = {}
+        stats.update(requests=0, errors=0, retries=0, throttled=0, concurrency=max_concurrency,
+                     prompt_tokens=0, completion_tokens=0)
+        if self._no_retry_model is None:
+            self._no_retry_model = self.model.with_options(max_retries=0)
+        limiter = _AdaptiveLimiter(max_concurrency)
+        requests_budget = _TokenBucket(rpm) if rpm else None
+        tokens_budget = _TokenBucket(tpm) if tpm else None
+        if hasattr(requests, "__aiter__"):
+            async def indexed():
+                index = 0
+                async for request in requests:
+                    yield index, request
+                    index += 1
+            source = indexed()
+        else:
+            source = enumerate(requests)
+
+        async def run_one(messages: List[Dict[str, Any]], params: Dict[str, Any]) -> Dict[str, Any]:
+            request_model = params.pop("model", model)
+            estimate = _estimate_tokens(messages, params)
+            attempt = 0
+            _queued_at.set(time.monotonic())
+            while True:
+                attempt += 1
+                reserved = False
+                await limiter.acquire()
+                try:
+                    if requests_budget is not None:
+                        await requests_budget.take(1)
+                    if tokens_budget is not None:
+                        await tokens_budget.take(estimate)
+                        reserved = True
+                    started = time.monotonic()
+                    response = await self.chatNoStream(messages, request_model, **params)
+                    reserved = False
+                    usage = response.get("usage") or {}
+                    limiter.succeeded(time.monotonic() - started, usage.get("completion_tokens"))
+                    if tokens_budget is not None and usage.get("total_tokens") is not None:
+                        tokens_budget.credit(estimate - usage["total_tokens"])
+                    stats["prompt_tokens"] += usage.get("prompt_tokens") or 0
+                    stats["completion_tokens"] += usage.get("completion_tokens") or 0
+                    return response
+                except RateLimitError as e:
+                    stats["throttled"] += 1
+                    limiter.throttled(_retry_after(e, attempt))
+                    if attempt >= max_attempts:
+                        raise
+                except (APIConnectionError, APITimeoutError, InternalServerError):
+                    if attempt >= max_attempts:
+                        raise
+                    await asyncio.sleep(min(30.0, 2 ** attempt) * random.uniform(0.5, 1.0))
+                finally:
+                    if reserved:  # failed attempts don't count against the upstream TPM
+                        tokens_budget.credit(estimate)
+                    await limiter.release()
+                    stats["concurrency"] = int(limiter.limit)
+                stats["retries"] += 1
+
+        async def run_request(item: Tuple[int, Any]) -> Dict[str, Any]:
+            _client_override.set(self._no_retry_model)
+            request = item[1]
+            if isinstance(request, dict):
+                params = {**kwargs, **request}
+                messages = params.pop("messages")
+            else:
+                params, messages = dict(kwargs), request
+            return await run_one(messages, params)
+
+        results = fan_out(source, run_request, max_concurrency)
+        try:
+            async for (index, _), response, error in results:
+                stats["requests"] += 1
+                if error is not None:
+                    stats["errors"] += 1
+                yield index, response, error
+        finally:
+            # stops the requests in flight when the consumer leaves early
+            await results.aclose()
 
     def chat(self, messages: List[Dict[str, str]], model: Optional[str] = None, stream: Optional[bool] = False, **kwargs):
         if stream:
@@ -61,24 +1067,34 @@ class OpenAILLM:
         else:
             return self.chatNoStream(messages=messages, model=model, **kwargs)
 
-    async def _standard_stream_response(self, resp: Stream[ChatCompletionChunk]):
-        return {
-            "id": resp.id,
-            "model": resp.model,
-            "choices": [
-                {
-                    "index": choice.index,
-                    "delta": {
-                        "role": choice.delta.role,
-                        "content": choice.delta.content
-                    },
-                    "finish_reason": choice.finish_reason
-                }
-                for choice in resp.choices
-            ]
-        }
+    def _standard_stream_response(self, resp: ChatCompletionChunk) -> StreamChunk:
+        choices = []
+        for choice in resp.choices:
+            delta = choice.delta
+            tool_calls = delta.tool_calls
+            if tool_calls:
+                tool_calls = [
+                    {
+                        "index": call.index,
+                        "id": call.id,
+                        "type": call.type,
+                        "function": {
+                            "name": call.function.name if call.function else None,
+                            "arguments": call.function.arguments if call.function else None
+                        }
+                    } for call in tool_calls
+                ]
+            choices.append(ChoiceDelta(choice.index, delta.role, delta.content, choice.finish_reason, tool_calls))
+        usage = resp.usage
+        if usage is not None:
+            usage = {
+                "prompt_tokens": usage.prompt_tokens,
+                "completion_tokens": usage.completion_tokens,
+                "total_tokens": usage.total_tokens
+            }
+        return StreamChunk(resp.id, resp.model, choices, usage, resp.created)
 
-    async def _standard_no_stream_response(self, resp: ChatCompletion):
+    def _standard_no_stream_response(self, resp: ChatCompletion):
         return {
             "id": resp.id,
             "object": resp.object,
@@ -1,12 +1,27 @@
 # just a copy of my aiologging XD
-import aiofiles
+import asyncio
 import datetime
+import gzip
+import io
+import json
 import os
+import shutil
+import struct
+import logging
 import sys
+import threading
+import time
 
 from asyncio import Lock
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
-from typing import Any, Dict, Optional, Union
+from functools import total_ordering
+from typing import Any, Callable, Dict, Iterator, Optional, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 class Styles(object):
@@ -99,19 +114,40 @@ class Styled(object):
     def __str__(self) -> str:
         return self.styled_str
 
-    def format(self, *args):
+    def format(self, *args, **kwargs):
+        args = [arg.resolve() if type(arg) is Lazy else arg for arg in args]
+        kwargs = {key: arg.resolve() if type(arg) is Lazy else arg
+                  for key, arg in kwargs.items()}
         args_plain = [str(arg) if type(
             arg) is not Styled else arg.plain for arg in args]
-        self.plain_str = self.plain_str.format(*args_plain)
+        kwargs_plain = {key: str(arg) if type(
+            arg) is not Styled else arg.plain for key, arg in kwargs.items()}
+        self.plain_str = self.plain_str.format(*args_plain, **kwargs_plain)
 
         styles_rep = ''.join([Styles.make_color_prefix(
             single_style) for single_style in self.styles])
         args_styled = [
             f"{Styles.make_color_prefix(Styles.CLEAR)}{str(arg)}{styles_rep}" for arg in args]
-        self.styled_str = self.styled_str.format(*args_styled)
+        kwargs_styled = {
+            key: f"{Styles.make_color_prefix(Styles.CLEAR)}{str(arg)}{styles_rep}" for key, arg in kwargs.items()}
+        self.styled_str = self.styled_str.format(*args_styled, **kwargs_styled)
         return self
 
 
+class Lazy(object):
+    """Log argument that is only computed once a sink is going to emit the record."""
+    __slots__ = ("func", "args", "kwargs")
+
+    def __init__(self, func: Callable[..., Any], *args, **kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def resolve(self) -> Any:
+        return self.func(*self.args, **self.kwargs)
+
+
+@total_ordering
 class Levels(Enum):
     DEBUG = 0
     INFO = 1
@@ -120,6 +156,11 @@ class Levels(Enum):
     ERROR = 4
     CRITICAL = 5
 
+    def __lt__(self, other):
+        if type(other) is Levels:
+            return self.value < other.value
+        return NotImplemented
+
 
 class LoggerConfig(object):
     DEFAULT_CONFIG = {
@@ -174,6 +215,22 @@ class LoggerConfig(object):
             "log_append_time": True,
             "log_time_format": "%Y-%m-%d",
             "flush_every_n_logs": 0,
+            "format": "text",
+            "writer": {
+                "enabled": False,
+                "queue_size": 10000,
+                "flush_bytes": 65536,
+                "flush_interval": 1.0,
+                "drop_when_full": False
+            },
+            "rotation": {
+                "max_bytes": 0,
+                "interval": 0,
+                "compress": None,
+                "backup_count": 0,
+                "max_age": 0,
+                "per_process": False
+            },
             "time": {
                 "enabled": True,
                 "time_format": "%Y-%m-%d %H:%M:%S",
@@ -214,41 +271,87 @@ class LoggerConfig(object):
     }
 
 
-class Logger(object):
-    def __init__(self, config: Optional[Dict[str, Any]] = LoggerConfig.DEFAULT_CONFIG, **kwargs):
-        self.config = {**config, **kwargs}
-        if self.config.get("file", {}).get("enabled", False):
-            os.makedirs(self.config["file"].get(
-                "log_root_path", "./logs"), exist_ok=True)
-        self.log_buffer = []
-        self._lock = Lock()
+try:
+    import fcntl
+    _LOCK_SH, _LOCK_EX, _LOCK_UN = fcntl.LOCK_SH, fcntl.LOCK_EX, fcntl.LOCK_UN
+except ImportError:  # no flock on windows, rotation there is per-process only
+    fcntl = None
+    _LOCK_SH = _LOCK_EX = _LOCK_UN = 0
 
-    async def log(self, level: Levels, text: Union[Styled, Any], *args, **kwargs):
-        text = (Styled(text) if not isinstance(text, Styled)
-                else text).format(*args, **kwargs)
-        if self.config["print"]["enabled"] and level >= self.config["print"]["log_level"]:
-            prefix = self._make_prefix_s(level, "print")
-            ostr = "{}{}".format(
-                str(prefix) if self.config["print"]["colored"] else prefix.plain,
-                str(text) if self.config["print"]["colored"] else text.plain
-            )
-            if level < Levels.ERROR:
-                sys.stdout.write(ostr + "\n")
-                sys.stdout.flush()
-            else:
-                sys.stderr.write(ostr + "\n")
-                sys.stderr.flush()
-
-        if self.config["file"]["enabled"] and level >= self.config["file"]["log_level"]:
-            prefix = self._make_prefix_s(level, "file")
-            ostr = "{}{}".format(
-                str(prefix) if self.config["file"]["colored"] else prefix.plain,
-                str(text) if self.config["file"]["colored"] else text.plain
-            )
-            async with self._lock:
-                self.log_buffer.append(ostr)
-                await self._check_flush()
 
+def _flock(fd, operation):
+    if fcntl is not None:
+        fcntl.flock(fd, operation)
+
+
+# stands in for the timestamp while prefixes are compiled, then split on
+_TIME_PLACEHOLDER = "\x00"
+# queued after the last line to stop the background writer
+_WRITER_CLOSE = object()
+# threshold of a disabled sink, above every level
+_DISABLED = len(Levels)
+_FILE_FORMATS = ("text", "json", "msgpack")
+# msgpack records are framed by a big-endian payload length
+_MSGPACK_HEADER = struct.Struct(">I")
+# fields of every structured record, bound context may not replace them
+_RECORD_FIELDS = frozenset(("ts", "time", "level", "template", "args", "kwargs"))
+
+
+def _check_context(context: Dict[str, Any]) -> Dict[str, Any]:
+    reserved = _RECORD_FIELDS.intersection(context)
+    if reserved:
+        raise ValueError(f"Reserved log record fields can't be bound: {', '.join(sorted(reserved))}")
+    return context
+
+
+def _dump_json(record):
+    if orjson is not None:
+        try:
+            return orjson.dumps(record, default=str) + b"\n"
+        except TypeError:  # e.g. ints wider than 64 bits
+            pass
+    return (json.dumps(record, default=str, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _dump_msgpack(record):
+    import msgpack
+    payload = msgpack.packb(record, default=str)
+    return _MSGPACK_HEADER.pack(len(payload)) + payload
+
+
+def read_records(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Iterate the records of a json or msgpack log file written by Logger,
+    including rotated .gz/.zst files, without loading the whole file.
+    """
+    if path.endswith(".gz"):
+        f = gzip.open(path, "rb")
+    elif path.endswith(".zst"):
+        import zstandard
+        # the zstd reader has no readline/iteration and may return short reads
+        f = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, "rb")))
+    else:
+        f = open(path, "rb")
+    with f:
+        head = f.read(1)
+        if not head:
+            return
+        if head == b"{":
+            loads = orjson.loads if orjson is not None else json.loads
+            yield loads(head + f.readline())
+            for line in f:
+                if line.strip():
+                    yield loads(line)
+            return
+        import msgpack
+        header = head + f.read(_MSGPACK_HEADER.size - 1)
+        while len(header) == _MSGPACK_HEADER.size:
+            size, = _MSGPACK_HEADER.unpack(header)
+            yield msgpack.unpackb(f.read(size))
+            header = f.read(_MSGPACK_HEADER.size)
+
+
+class _LevelMethods(object):
     async def debug(self, text: Union[Styled, Any], *args, **kwargs):
         await self.log(Levels.DEBUG, text, *args, **kwargs)
 
@@ -267,14 +370,212 @@ class Logger(object):
     async def critical(self, text: Union[Styled, Any], *args, **kwargs):
         await self.log(Levels.CRITICAL, text, *args, **kwargs)
 
-    def _make_time_s(self, source="print"):
+
+class Logger(_LevelMethods):
+    def __init__(self, config: Optional[Dict[str, Any]] = LoggerConfig.DEFAULT_CONFIG, **kwargs):
+        self.log_buffer = []
+        self.context = {}
+        self._lock = Lock()
+        self._prefixes = {}
+        self._time_cache = {}
+        self._print_level = _DISABLED
+        self._file_level = _DISABLED
+        self._min_level = _DISABLED
+        self._file_format = "text"
+        self._writer = {}
+        self._writer_queue = None
+        self._writer_task = None
+        self._rotation = {}
+        self._rotation_executor = None
+        # rotations still compressing or pruning; finished ones remove themselves
+        self._rotation_futures = set()
+        self._log_fd = None
+        self._log_fd_path = None
+        self._log_period = 0
+        self._fd_lock = threading.RLock()
+        self._loop = None
+        self._sync = None
+        self._handoff = []
+        self._handoff_lock = threading.Lock()
+        self._handoff_scheduled = False
+        self._handoff_tasks = set()
+        self.dropped_logs = 0
+        self.configure(config, **kwargs)
+
+    def configure(self, config: Optional[Dict[str, Any]] = None, **kwargs):
+        """Apply a new configuration and recompile the per-level line prefixes."""
+        self.config = {**(self.config if config is None else config), **kwargs}
+        if self.config.get("file", {}).get("enabled", False):
+            os.makedirs(self.config["file"].get(
+                "log_root_path", "./logs"), exist_ok=True)
+        # a disabled sink's config may be just {"enabled": False}
+        self._prefixes = {
+            source: {
+                level: self._compile_prefix(level, source) for level in Levels
+            } for source in ("print", "file") if self.config[source].get("enabled", False)
+        }
+        self._time_cache.clear()
+        self._print_level = self.config["print"]["log_level"].value \
+            if self.config["print"]["enabled"] else _DISABLED
+        self._file_level = self.config["file"]["log_level"].value \
+            if self.config["file"]["enabled"] else _DISABLED
+        self._min_level = min(self._print_level, self._file_level)
+        self._file_format = self.config["file"].get("format", "text")
+        if self._file_format not in _FILE_FORMATS:
+            raise ValueError(f"Unsupported log file format: {self._file_format}")
+        if self._file_format == "msgpack":
+            import msgpack  # noqa: F401, fail here rather than on the first record
+        self._writer = {
+            **LoggerConfig.DEFAULT_CONFIG["file"]["writer"],
+            **self.config.get("file", {}).get("writer", {})
+        }
+        self._rotation = {
+            **LoggerConfig.DEFAULT_CONFIG["file"]["rotation"],
+            **self.config.get("file", {}).get("rotation", {})
+        }
+
+    def enabled_for(self, level: Levels) -> bool:
+        """Whether any sink would emit a record of this level."""
+        return level.value >= self._min_level
+
+    def bind(self, **context) -> "BoundLogger":
+        """Logger view that adds these fields to every structured record."""
+        return BoundLogger(self, {**self.context, **_check_context(context)})
+
+    @property
+    def sync(self) -> "SyncLogger":
+        """Synchronous front-end that can be called from any thread."""
+        if self._sync is None:
+            self._sync = SyncLogger(self, self.context)
+        return self._sync
+
+    async def log(self, level: Levels, text: Union[Styled, Any], *args, **kwargs):
+        if level.value < self._min_level:
+            return
+        await self._emit(level, text, args, kwargs, self.context)
+
+    async def _emit(self, level, text, args, kwargs, context):
+        if self._loop is None or self._loop.is_closed():
+            self._loop = asyncio.get_running_loop()
+        line = self._prepare(level, text, args, kwargs, context)
+        if line is not None:
+            if self._writer["enabled"]:
+                await self._enqueue(line)
+            else:
+                async with self._lock:
+                    self.log_buffer.append(line)
+                    await self._check_flush()
+
+    def _prepare(self, level, text, args, kwargs, context, formatted=False):
+        # writes the print sink and returns the encoded file sink line, if any.
+        # formatted text is final: its braces are not placeholders
+        value = level.value
+        line = None
+        structured = value >= self._file_level and self._file_format != "text"
+        if structured:
+            args = [arg.resolve() if type(arg) is Lazy else arg for arg in args]
+            kwargs = {key: arg.resolve() if type(arg) is Lazy else arg
+                      for key, arg in kwargs.items()}
+            line = self._encode_record(level, text, args, kwargs, context)
+        if value >= self._print_level or (value >= self._file_level and not structured):
+            if not isinstance(text, Styled):
+                text = Styled(text)
+            if not formatted:
+                text = text.format(*args, **kwargs)
+            if value >= self._print_level:
+                ostr = self._render(level, text, "print")
+                if level < Levels.ERROR:
+                    sys.stdout.write(ostr + "\n")
+                    sys.stdout.flush()
+                else:
+                    sys.stderr.write(ostr + "\n")
+                    sys.stderr.flush()
+            if not structured and value >= self._file_level:
+                line = (self._render(level, text, "file") + "\n").encode("utf-8")
+        return line
+
+    def _handoff_line(self, line):
+        # called from any thread by the sync front-end. lines pile up in a
+        # plain list and the event loop is only woken once per batch
+        loop = self._loop
+        handoff = loop is not None and loop.is_running()
+        with self._handoff_lock:
+            if len(self._handoff) >= self._writer["queue_size"]:
+                if self._writer["drop_when_full"]:
+                    self.dropped_logs += 1
+                    return
+                # full: write the backlog from this thread, as a blocking put would wait for it
+                handoff = False
+            self._handoff.append(line)
+            if handoff:
+                if self._handoff_scheduled:
+                    return
+                self._handoff_scheduled = True
+        if handoff:
+            try:
+                loop.call_soon_threadsafe(self._drain_handoff)
+                return
+            except RuntimeError:  # loop closed in the meantime
+                pass
+        # no event loop to hand off to, write from this thread instead
+        with self._handoff_lock:
+            lines, self._handoff = self._handoff, []
+            self._handoff_scheduled = False
+        try:
+            self._write_sync(b"".join(lines))
+        except Exception as e:
+            sys.stderr.write(
+                f"Errors occurred while attempting to flush logs to file {self._log_path()} : {e}"
+            )
+
+    def _drain_handoff(self):
+        with self._handoff_lock:
+            lines, self._handoff = self._handoff, []
+            self._handoff_scheduled = False
+        if lines:
+            task = asyncio.get_running_loop().create_task(self._flush_handoff(lines))
+            self._handoff_tasks.add(task)
+            task.add_done_callback(self._handoff_tasks.discard)
+
+    async def _flush_handoff(self, lines):
+        if self._writer["enabled"]:
+            await self._enqueue(b"".join(lines), len(lines))
+        else:
+            async with self._lock:
+                self.log_buffer.extend(lines)
+                await self._check_flush()
+
+    def _encode_record(self, level, text, args, kwargs, context):
+        now = time.time()
+        record = {
+            "ts": now,
+            "time": self._iso_now(now),
+            "level": level.name,
+            "template": text.plain if isinstance(text, Styled) else str(text),
+            "args": [arg.plain if type(arg) is Styled else arg for arg in args]
+        }
+        if kwargs:
+            record["kwargs"] = {key: arg.plain if type(arg) is Styled else arg
+                                for key, arg in kwargs.items()}
+        if context:
+            if _RECORD_FIELDS.isdisjoint(context):
+                record.update(context)
+            else:  # context assigned directly rather than through bind()
+                for key, value in context.items():
+                    if key not in _RECORD_FIELDS:
+                        record[key] = value
+        if self._file_format == "json":
+            return _dump_json(record)
+        return _dump_msgpack(record)
+
+    def _make_time_s(self, source="print", time_str=None):
         return Styled(
             self.config[source]["time"]["time_quote_format"],
             *self.config[source]["time"]["time_quote_styles"]
         ).format(
             Styled(
                 datetime.datetime.now().strftime(
-                    self.config[source]["time"]["time_format"]),
+                    self.config[source]["time"]["time_format"]) if time_str is None else time_str,
                 *self.config[source]["time"]["time_styles"]
             )
         )
@@ -285,34 +586,366 @@ class Logger(object):
             *self.config[source]["level"]["levels"][str(level)]["styles"]
         )
 
-    def _make_prefix_s(self, level, source="print", sep=" "):
+    def _make_prefix_s(self, level, source="print", sep=" ", time_str=None):
         return Styled("{}{}{}{}").format(
             self._make_time_s(
-                source) if self.config[source]["time"]["enabled"] else '',
+                source, time_str) if self.config[source]["time"]["enabled"] else '',
             sep,
             self._make_level_s(
                 level, source) if self.config[source]["level"]["enabled"] else '',
             sep
         )
 
+    def _compile_prefix(self, level, source="print"):
+        # renders the prefix once with a placeholder timestamp and keeps the
+        # text around it, so a log call only has to splice in the time string
+        prefix = self._make_prefix_s(level, source, time_str=_TIME_PLACEHOLDER)
+        prefix = str(prefix) if self.config[source]["colored"] else prefix.plain
+        head, found, tail = prefix.partition(_TIME_PLACEHOLDER)
+        time_format = self.config[source]["time"]["time_format"] if found else None
+        return head, time_format, tail
+
+    def _now_s(self, time_format, now=None):
+        if now is None:
+            now = time.time()
+        second = int(now)
+        cached = self._time_cache.get(time_format)
+        if cached is not None and cached[0] == second:
+            return cached[1]
+        time_str = datetime.datetime.fromtimestamp(now).strftime(time_format)
+        if "%f" not in time_format:
+            self._time_cache[time_format] = (second, time_str)
+        return time_str
+
+    def _iso_now(self, now):
+        # ISO-8601 with the local UTC offset, so records from different hosts compare
+        second = int(now)
+        cached = self._time_cache.get(None)
+        if cached is not None and cached[0] == second:
+            return cached[1]
+        time_str = datetime.datetime.fromtimestamp(second).astimezone().isoformat()
+        self._time_cache[None] = (second, time_str)
+        return time_str
+
+    def _render(self, level, text, source="print"):
+        head, time_format, tail = self._prefixes[source][level]
+        if time_format is not None:
+            head = head + self._now_s(time_format) + tail
+        return head + (str(text) if self.config[source]["colored"] else text.plain)
+
     async def _check_flush(self):
         if len(self.log_buffer) > self.config["file"]["flush_every_n_logs"]:
             await self._flush_now()
 
-    async def _flush_now(self):
-        fpath = "{}/{}{}.{}".format(
+    async def aclose(self):
+        """Write out every buffered or queued line and close the log file."""
+        self._drain_handoff()
+        while self._handoff_tasks:
+            await asyncio.gather(*self._handoff_tasks)
+        if self._writer_task is not None:
+            await self._writer_queue.put(_WRITER_CLOSE)
+            await self._writer_task
+            self._writer_task = None
+            self._writer_queue = None
+        async with self._lock:
+            if self.log_buffer:
+                await self._flush_now()
+        self._close_log_sync()
+        # list() copies the set in one step while the worker thread discards from it
+        for future in list(self._rotation_futures):
+            await asyncio.wrap_future(future)
+
+    def _log_path(self):
+        return "{}/{}{}{}.{}".format(
             self.config["file"]["log_root_path"],
             self.config["file"]["log_name"],
             datetime.datetime.now().strftime(
                 self.config["file"]["log_time_format"]) if self.config["file"]["log_append_time"] else '',
+            f".{os.getpid()}" if self._rotation["per_process"] else '',
             self.config["file"]["log_suffix"]
         )
+
+    async def _enqueue(self, line, count=1):
+        if self._writer_task is None:
+            self._writer_queue = asyncio.Queue(self._writer["queue_size"])
+            self._writer_task = asyncio.get_running_loop().create_task(
+                self._writer_loop())
+        if self._writer["drop_when_full"]:
+            try:
+                self._writer_queue.put_nowait(line)
+            except asyncio.QueueFull:
+                self.dropped_logs += count
+        else:
+            await self._writer_queue.put(line)
+
+    async def _writer_loop(self):
+        loop = asyncio.get_running_loop()
+        queue = self._writer_queue
+        closing = False
+        while not closing:
+            line = await queue.get()
+            if line is _WRITER_CLOSE:
+                break
+            batch = [line]
+            size = len(line)
+            deadline = loop.time() + self._writer["flush_interval"]
+            # keep collecting until the batch is big enough or has waited long enough
+            while size < self._writer["flush_bytes"]:
+                try:
+                    line = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        line = await asyncio.wait_for(queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if line is _WRITER_CLOSE:
+                    closing = True
+                    break
+                batch.append(line)
+                size += len(line)
+            await self._write_batch(batch)
+
+    async def _write_batch(self, batch):
         try:
-            async with aiofiles.open(fpath, "a", encoding="utf-8") as f:
-                for log in self.log_buffer:
-                    await f.write(f"{log}\n")
-            self.log_buffer.clear()
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._write_sync, b"".join(batch))
+            return True
         except Exception as e:
             sys.stderr.write(
-                f"Errors occurred while attempting to flush logs to file {fpath} : {e}"
+                f"Errors occurred while attempting to flush logs to file {self._log_path()} : {e}"
             )
+            return False
+
+    def _write_sync(self, data):
+        # every batch goes out as a single O_APPEND write, so batches from
+        # processes sharing the file never interleave. writers hold a shared
+        # flock that keeps a rotating process from renaming the file under them
+        with self._fd_lock:
+            self._write_locked(data)
+
+    def _write_locked(self, data):
+        path = self._log_path()
+        while True:
+            fd = self._open_log_sync(path)
+            _flock(fd, _LOCK_SH)
+            try:
+                stat = os.fstat(fd)
+                moved = self._log_moved(path, stat)
+                if not moved and not self._rotation_due(stat, len(data)):
+                    view = memoryview(data)
+                    while view:
+                        view = view[os.write(fd, view):]
+                    return
+            finally:
+                _flock(fd, _LOCK_UN)
+            if moved:
+                self._close_log_sync()
+            else:
+                self._rotate_sync(path, fd)
+
+    def _open_log_sync(self, path):
+        if self._log_fd is not None and path == self._log_fd_path:
+            return self._log_fd
+        self._close_log_sync()
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        stat = os.fstat(fd)
+        interval = self._rotation["interval"]
+        self._log_fd, self._log_fd_path = fd, path
+        self._log_period = int(
+            (stat.st_mtime if stat.st_size else time.time()) // interval) if interval else 0
+        return fd
+
+    def _close_log_sync(self):
+        with self._fd_lock:
+            if self._log_fd is not None:
+                try:
+                    os.close(self._log_fd)
+                finally:
+                    self._log_fd = None
+                    self._log_fd_path = None
+
+    def _log_moved(self, path, stat):
+        try:
+            return os.stat(path).st_ino != stat.st_ino
+        except FileNotFoundError:
+            return True
+
+    def _rotation_due(self, stat, incoming):
+        if not stat.st_size:
+            return False
+        max_bytes = self._rotation["max_bytes"]
+        if max_bytes and stat.st_size + incoming > max_bytes:
+            return True
+        interval = self._rotation["interval"]
+        return bool(interval) and int(time.time() // interval) != self._log_period
+
+    def _rotate_sync(self, path, fd):
+        rotated = None
+        _flock(fd, _LOCK_EX)
+        try:
+            # another process may have rotated it while we waited for the lock
+            if not self._log_moved(path, os.fstat(fd)):
+                rotated = "{}.{}".format(
+                    path, datetime.datetime.now().strftime("%Y%m%d-%H%M%S"))
+                candidate, n = rotated, 0
+                while any(os.path.exists(candidate + ext) for ext in ("", ".gz", ".zst")):
+                    n += 1
+                    candidate = f"{rotated}-{n}"
+                rotated = candidate
+                os.rename(path, rotated)
+        finally:
+            _flock(fd, _LOCK_UN)
+        self._close_log_sync()
+        if rotated is not None:
+            if self._rotation_executor is None:
+                self._rotation_executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="log-rotation")
+            future = self._rotation_executor.submit(self._finish_rotation, rotated)
+            self._rotation_futures.add(future)
+            future.add_done_callback(self._rotation_futures.discard)
+
+    def _finish_rotation(self, rotated):
+        # runs on the rotation worker thread, away from the writer and the event loop
+        try:
+            if self._rotation["compress"]:
+                self._compress_sync(rotated)
+            self._prune_sync()
+        except Exception as e:
+            sys.stderr.write(
+                f"Errors occurred while attempting to rotate log file {rotated} : {e}"
+            )
+
+    def _compress_sync(self, path):
+        method = self._rotation["compress"]
+        if method == "gzip":
+            target = path + ".gz"
+            tmp = target + ".tmp"
+            out = gzip.open(tmp, "wb")
+        elif method == "zstd":
+            import zstandard
+            target = path + ".zst"
+            tmp = target + ".tmp"
+            out = zstandard.ZstdCompressor().stream_writer(open(tmp, "wb"))
+        else:
+            raise ValueError(f"Unsupported log compression: {method}")
+        with open(path, "rb") as src, out:
+            shutil.copyfileobj(src, out, 1 << 20)
+        os.replace(tmp, target)
+        os.remove(path)
+
+    def _prune_sync(self):
+        backup_count = self._rotation["backup_count"]
+        max_age = self._rotation["max_age"]
+        if not backup_count and not max_age:
+            return
+        file_config = self.config["file"]
+        # files still being appended to today, by us or by other processes
+        current = file_config["log_name"] + (datetime.datetime.now().strftime(
+            file_config["log_time_format"]) if file_config["log_append_time"] else '')
+        active_suffix = "." + file_config["log_suffix"]
+        candidates = []
+        for entry in os.scandir(file_config["log_root_path"]):
+            name = entry.name
+            if not name.startswith(file_config["log_name"]) or name.endswith(".tmp") \
+                    or (name.startswith(current) and name.endswith(active_suffix)) \
+                    or not entry.is_file():
+                continue
+            candidates.append((entry.stat().st_mtime, entry.path))
+        candidates.sort(reverse=True)
+        now = time.time()
+        for i, (mtime, fpath) in enumerate(candidates):
+            if (backup_count and i >= backup_count) or (max_age and now - mtime > max_age):
+                try:
+                    os.remove(fpath)
+                except FileNotFoundError:
+                    pass
+
+    async def _flush_now(self):
+        if await self._write_batch(self.log_buffer):
+            self.log_buffer.clear()
+
+
+class BoundLogger(_LevelMethods):
+    def __init__(self, logger: Logger, context: Dict[str, Any]):
+        self.logger = logger
+        self.context = context
+
+    def bind(self, **context) -> "BoundLogger":
+        return BoundLogger(self.logger, {**self.context, **_check_context(context)})
+
+    async def log(self, level: Levels, text: Union[Styled, Any], *args, **kwargs):
+        if level.value < self.logger._min_level:
+            return
+        await self.logger._emit(level, text, args, kwargs, self.context)
+
+    @property
+    def sync(self) -> "SyncLogger":
+        return SyncLogger(self.logger, self.context)
+
+
+class SyncLogger(object):
+    def __init__(self, logger: Logger, context: Dict[str, Any]):
+        self.logger = logger
+        self.context = context
+
+    def log(self, level: Levels, text: Union[Styled, Any], *args, **kwargs):
+        logger = self.logger
+        if level.value < logger._min_level:
+            return
+        line = logger._prepare(level, text, args, kwargs, self.context)
+        if line is not None:
+            logger._handoff_line(line)
+
+    def debug(self, text: Union[Styled, Any], *args, **kwargs):
+        self.log(Levels.DEBUG, text, *args, **kwargs)
+
+    def info(self, text: Union[Styled, Any], *args, **kwargs):
+        self.log(Levels.INFO, text, *args, **kwargs)
+
+    def notice(self, text: Union[Styled, Any], *args, **kwargs):
+        self.log(Levels.NOTICE, text, *args, **kwargs)
+
+    def warning(self, text: Union[Styled, Any], *args, **kwargs):
+        self.log(Levels.WARNING, text, *args, **kwargs)
+
+    def error(self, text: Union[Styled, Any], *args, **kwargs):
+        self.log(Levels.ERROR, text, *args, **kwargs)
+
+    def critical(self, text: Union[Styled, Any], *args, **kwargs):
+        self.log(Levels.CRITICAL, text, *args, **kwargs)
+
+
+class LoggingHandler(logging.Handler):
+    """Routes stdlib `logging` records through a Logger's synchronous front-end."""
+
+    def __init__(self, logger: Logger, level: int = logging.NOTSET):
+        super().__init__(level)
+        self.logger = logger
+
+    @staticmethod
+    def map_level(levelno: int) -> Levels:
+        if levelno >= logging.CRITICAL:
+            return Levels.CRITICAL
+        if levelno >= logging.ERROR:
+            return Levels.ERROR
+        if levelno >= logging.WARNING:
+            return Levels.WARNING
+        if levelno >= logging.INFO:
+            return Levels.INFO
+        return Levels.DEBUG
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            level = self.map_level(record.levelno)
+            if not self.logger.enabled_for(level):
+                return
+            line = self.logger._prepare(
+                level, self.format(record), (), {}, {**self.logger.context, "logger": record.name},
+                formatted=True)
+            if line is not None:
+                self.logger._handoff_line(line)
+        except Exception:
+            self.handleError(record)
@@ -1,25 +1,481 @@
+import asyncio
+import hashlib
+import json
+import mmap
+import os
+import time
+
+from aiobotocore.config import AioConfig
 from aiobotocore.session import get_session
-from typing import Optional
+from botocore.exceptions import ClientError
+from contextlib import AsyncExitStack
+from filelock import AsyncFileLock, FileLock, Timeout
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional, Tuple, Union
+
+try:
+    from ._fanout import fan_out
+except ImportError:  # used as flat modules
+    from _fanout import fan_out
+
+_CHUNK_SIZE = 1 << 20
+_PART_SIZE = 8 << 20
+# S3 limits a multipart upload to 10000 parts of at least 5 MiB (but the last)
+_MAX_PARTS = 10000
+_MIN_PART_SIZE = 5 << 20
+
+
+def _read_all(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _remove_if_exists(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
 
 
 class MinioUtils(object):
-    def __init__(self, endpoint_url: str, access_key: str, secret_key: str, bucket_name: str):
+    def __init__(self, endpoint_url: str, access_key: str, secret_key: str, bucket_name: str,
+                 max_pool_connections: Optional[int] = 32,
+                 keepalive_timeout: Optional[float] = 60.0,
+                 tcp_keepalive: Optional[bool] = True,
+                 connect_timeout: Optional[float] = 10.0,
+                 read_timeout: Optional[float] = 60.0,
+                 max_attempts: Optional[int] = 3,
+                 retry_mode: Optional[str] = "standard",
+                 cache_dir: Optional[str] = None,
+                 cache_max_bytes: Optional[int] = 10 << 30,
+                 cache_fresh_for: Optional[float] = 0.0,
+                 **client_kwargs):
         self.endpoint_url = endpoint_url
         self.access_key = access_key
         self.secret_key = secret_key
         self.bucket_name = bucket_name
+        # one client (and so one connection pool) is shared by every call; it
+        # is created on first use and lives until aclose()
+        self.config = AioConfig(
+            max_pool_connections=max_pool_connections,
+            tcp_keepalive=tcp_keepalive,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            retries={"max_attempts": max_attempts, "mode": retry_mode},
+            connector_args={"keepalive_timeout": keepalive_timeout})
+        self.client_kwargs: Dict[str, Any] = client_kwargs
+        self._session = get_session()
+        self._client = None
+        self._exit_stack: Optional[AsyncExitStack] = None
+        self._client_lock = asyncio.Lock()
+        # objects read through the cache are kept in cache_dir (least recently
+        # used evicted past cache_max_bytes) and revalidated with If-None-Match,
+        # or not at all within cache_fresh_for seconds of the last check
+        self.cache_dir = cache_dir
+        self.cache_max_bytes = cache_max_bytes
+        self.cache_fresh_for = cache_fresh_for
+        self.cache_stats = {"hits": 0, "revalidated": 0, "misses": 0, "bytes_downloaded": 0, "evictions": 0}
+        self._cache_inflight: Dict[str, asyncio.Future] = {}
+        self._cache_bytes: Optional[int] = None
+        self._cache_evicting = False
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    async def client(self):
+        """The shared S3 client, opened on the first call."""
+        if self._client is None:
+            async with self._client_lock:
+                if self._client is None:
+                    exit_stack = AsyncExitStack()
+                    self._client = await exit_stack.enter_async_context(self._session.create_client(
+                        "s3",
+                        endpoint_url=self.endpoint_url,
+                        aws_access_key_id=self.access_key,
+                        aws_secret_access_key=self.secret_key,
+                        config=self.config,
+                        **self.client_kwargs
+                    ))
+                    self._exit_stack = exit_stack
+        return self._client
+
+    async def aclose(self):
+        if self._exit_stack is not None:
+            exit_stack, self._exit_stack, self._client = self._exit_stack, None, None
+            await exit_stack.aclose()
+
+    async def __aenter__(self) -> "MinioUtils":
+        await self.client()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
 
     async def read_file(self, object_name: str, bucket_name: Optional[str] = None):
         if not bucket_name:
             bucket_name = self.bucket_name
-        session = get_session()
-        async with session.create_client(
-            "s3",
-            endpoint_url=self.endpoint_url,
-            aws_access_key_id=self.access_key,
-            aws_secret_access_key=self.secret_key
-        ) as client:
-            response = await client.get_object(Bucket=bucket_name, Key=object_name)
-            async with response["Body"] as stream:
-                data = await stream.read()
-            return data
+        if self.cache_dir:
+            for attempt in range(3):
+                path = await self.cached_path(object_name, bucket_name)
+                try:
+                    # off the event loop, cached objects can be large
+                    return await asyncio.to_thread(_read_all, path)
+                except FileNotFoundError:
+                    # evicted by a concurrent download before we got to it
+                    if attempt == 2:
+                        raise
+        client = await self.client()
+        response = await client.get_object(Bucket=bucket_name, Key=object_name)
+        async with response["Body"] as stream:
+            data = await stream.read()
+        return data
+
+    async def iter_file(self, object_name: str, bucket_name: Optional[str] = None,
+                        chunk_size: Optional[int] = _CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """Yield the object in chunks of at most chunk_size bytes as they arrive."""
+        if not bucket_name:
+            bucket_name = self.bucket_name
+        client = await self.client()
+        response = await client.get_object(Bucket=bucket_name, Key=object_name)
+        async with response["Body"] as stream:
+            async for chunk in stream.iter_chunks(chunk_size):
+                yield chunk
+
+    async def download_file(self, object_name: str, bucket_name: Optional[str] = None,
+                            into: Union[None, str, bytearray, memoryview, mmap.mmap] = None,
+                            part_size: Optional[int] = _PART_SIZE,
+                            concurrency: Optional[int] = 8) -> Union[str, bytearray, memoryview, mmap.mmap]:
+        """
+        Download the object as concurrent ranged GETs of part_size bytes, each
+        written straight to its place in the destination: a new bytearray
+        (into=None), a writable buffer at least as large as the object, or a
+        file path that is preallocated and written through mmap. Returns the
+        destination. Parts are pinned to the object's ETag, so a concurrent
+        overwrite fails the download instead of mixing versions.
+        """
+        if not bucket_name:
+            bucket_name = self.bucket_name
+        client = await self.client()
+        head = await client.head_object(Bucket=bucket_name, Key=object_name)
+        size = head["ContentLength"]
+        etag = head["ETag"]
+        if isinstance(into, str):
+            with open(into, "wb+") as f:
+                f.truncate(size)
+                if size:
+                    with mmap.mmap(f.fileno(), size) as mapped:
+                        view = memoryview(mapped)
+                        try:
+                            await self._download_ranges(
+                                client, bucket_name, object_name, etag, view, size, part_size, concurrency)
+                        finally:
+                            view.release()
+                            mapped.flush()
+            return into
+        if into is None:
+            into = bytearray(size)
+        view = memoryview(into).cast("B")
+        if len(view) < size:
+            raise ValueError(f"Buffer of {len(view)} bytes is too small for {size} bytes")
+        try:
+            await self._download_ranges(
+                client, bucket_name, object_name, etag, view, size, part_size, concurrency)
+        finally:
+            view.release()
+        return into
+
+    async def _download_ranges(self, client, bucket_name: str, object_name: str, etag: str,
+                               view: memoryview, size: int, part_size: int, concurrency: int):
+        offsets = iter(range(0, size, part_size))
+
+        async def worker():
+            for start in offsets:
+                end = min(start + part_size, size)
+                response = await client.get_object(
+                    Bucket=bucket_name, Key=object_name, IfMatch=etag,
+                    Range=f"bytes={start}-{end - 1}")
+                async with response["Body"] as stream:
+                    position = start
+                    while position < end:
+                        chunk = await stream.read(min(_CHUNK_SIZE, end - position))
+                        if not chunk:
+                            raise IOError(f"{object_name}: range {start}-{end - 1} ended at {position}")
+                        view[position:position + len(chunk)] = chunk
+                        position += len(chunk)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(min(concurrency, -(-size // part_size)))]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+
+    async def upload_file(self, object_name: str, data: Union[str, bytes, bytearray, memoryview],
+                          bucket_name: Optional[str] = None,
+                          part_size: Optional[int] = _PART_SIZE,
+                          concurrency: Optional[int] = 8, **put_kwargs) -> Dict[str, Any]:
+        """
+        Upload bytes, a buffer or a file path. Objects larger than part_size go
+        up as a multipart upload with concurrency parts in flight (a file is
+        mmap'ed, not read into memory); a failed upload is aborted.
+        """
+        if not bucket_name:
+            bucket_name = self.bucket_name
+        client = await self.client()
+        if isinstance(data, str):
+            with open(data, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size <= part_size:
+                    return await client.put_object(
+                        Bucket=bucket_name, Key=object_name, Body=f.read(), **put_kwargs)
+                with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mapped:
+                    view = memoryview(mapped)
+                    try:
+                        return await self._upload_parts(
+                            client, bucket_name, object_name, view, part_size, concurrency, put_kwargs)
+                    finally:
+                        view.release()
+        view = memoryview(data).cast("B")
+        try:
+            if len(view) <= part_size:
+                return await client.put_object(
+                    Bucket=bucket_name, Key=object_name,
+                    Body=data if isinstance(data, bytes) else bytes(view), **put_kwargs)
+            return await self._upload_parts(
+                client, bucket_name, object_name, view, part_size, concurrency, put_kwargs)
+        finally:
+            view.release()
+
+    async def _upload_parts(self, client, bucket_name: str, object_name: str, view: memoryview,
+                            part_size: int, concurrency: int, put_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        size = len(view)
+        part_size = max(part_size, _MIN_PART_SIZE, -(-size // _MAX_PARTS))
+        upload = await client.create_multipart_upload(Bucket=bucket_name, Key=object_name, **put_kwargs)
+        upload_id = upload["UploadId"]
+        parts: List[Dict[str, Any]] = []
+        numbers = iter(enumerate(range(0, size, part_size), 1))
+
+        async def worker():
+            for number, start in numbers:
+                # botocore wants bytes; at most concurrency parts are copied at a time
+                response = await client.upload_part(
+                    Bucket=bucket_name, Key=object_name, UploadId=upload_id, PartNumber=number,
+                    Body=bytes(view[start:start + part_size]))
+                parts.append({"PartNumber": number, "ETag": response["ETag"]})
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(min(concurrency, -(-size // part_size)))]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            await client.abort_multipart_upload(Bucket=bucket_name, Key=object_name, UploadId=upload_id)
+            raise
+        parts.sort(key=lambda part: part["PartNumber"])
+        return await client.complete_multipart_upload(
+            Bucket=bucket_name, Key=object_name, UploadId=upload_id,
+            MultipartUpload={"Parts": parts})
+
+    async def open_file(self, object_name: str, bucket_name: Optional[str] = None) -> Union[mmap.mmap, bytes]:
+        """Read-only mmap of the cached object (b"" for an empty one); needs cache_dir."""
+        path = await self.cached_path(object_name, bucket_name)
+        with open(path, "rb") as f:
+            if not os.fstat(f.fileno()).st_size:
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    async def cached_path(self, object_name: str, bucket_name: Optional[str] = None) -> str:
+        """
+        Path of an up-to-date local copy of the object. Concurrent calls for
+        the same object share one download, across processes too.
+        """
+        if not self.cache_dir:
+            raise ValueError("MinioUtils was created without cache_dir")
+        if not bucket_name:
+            bucket_name = self.bucket_name
+        name = hashlib.sha1(f"{bucket_name}/{object_name}".encode("utf-8")).hexdigest()
+        flight = self._cache_inflight.get(name)
+        if flight is None:
+            flight = self._cache_inflight[name] = asyncio.ensure_future(
+                self._refresh_cached(bucket_name, object_name, name))
+            flight.add_done_callback(lambda _: self._cache_inflight.pop(name, None))
+        # one caller giving up must not cancel the download for the others
+        return await asyncio.shield(flight)
+
+    def _read_meta(self, path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path + ".meta", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if os.path.getsize(path) != meta["size"]:
+                return None
+            return meta
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_meta(self, path: str, meta: Dict[str, Any]):
+        tmp_path = f"{path}.meta.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, path + ".meta")
+
+    async def _refresh_cached(self, bucket_name: str, object_name: str, name: str) -> str:
+        path = os.path.join(self.cache_dir, name)
+        stats = self.cache_stats
+        started = time.time()
+        meta = self._read_meta(path)
+        if meta and started - meta["validated"] < self.cache_fresh_for:
+            stats["hits"] += 1
+            os.utime(path)
+            return path
+        async with AsyncFileLock(path + ".lock"):
+            # another process may have refreshed it while we waited
+            meta = self._read_meta(path)
+            if meta and (meta["validated"] >= started or time.time() - meta["validated"] < self.cache_fresh_for):
+                stats["hits"] += 1
+                os.utime(path)
+                return path
+            client = await self.client()
+            try:
+                response = await client.get_object(
+                    Bucket=bucket_name, Key=object_name, **({"IfNoneMatch": meta["etag"]} if meta else {}))
+            except ClientError as e:
+                if meta and e.response.get("ResponseMetadata", {}).get("HTTPStatusCode") == 304:
+                    stats["revalidated"] += 1
+                    meta["validated"] = time.time()
+                    await asyncio.to_thread(self._write_meta, path, meta)
+                    os.utime(path)
+                    return path
+                raise
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            size = 0
+            # the disk side runs in worker threads, one write per chunk
+            f = await asyncio.to_thread(open, tmp_path, "wb")
+            try:
+                try:
+                    async with response["Body"] as stream:
+                        async for chunk in stream.iter_chunks(_CHUNK_SIZE):
+                            await asyncio.to_thread(f.write, chunk)
+                            size += len(chunk)
+                finally:
+                    await asyncio.to_thread(f.close)
+                await asyncio.to_thread(os.replace, tmp_path, path)
+            except BaseException:
+                await asyncio.shield(asyncio.to_thread(_remove_if_exists, tmp_path))
+                raise
+            await asyncio.to_thread(self._write_meta, path, {
+                "bucket": bucket_name, "key": object_name, "etag": response["ETag"],
+                "size": size, "validated": time.time()})
+            stats["misses"] += 1
+            stats["bytes_downloaded"] += size
+        await self._evict_cached(path, size - (meta["size"] if meta else 0))
+        return path
+
+    async def _evict_cached(self, keep: str, added: int):
+        # other processes share the directory, so the running total is only an
+        # estimate; the directory is rescanned whenever it says we're over
+        if self._cache_bytes is not None:
+            self._cache_bytes += added
+            if self._cache_bytes <= self.cache_max_bytes:
+                return
+        if self._cache_evicting:  # the scan in flight settles the total
+            return
+        self._cache_evicting = True
+        try:
+            total, evictions = await asyncio.to_thread(self._scan_evict_cached, keep)
+        finally:
+            self._cache_evicting = False
+        self.cache_stats["evictions"] += evictions
+        self._cache_bytes = total
+
+    def _scan_evict_cached(self, keep: str) -> Tuple[int, int]:
+        """Remove least recently used objects until the directory fits; runs in a worker thread."""
+        files = []
+        locks = []
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if len(entry.name) == 40 and entry.is_file():  # sha1 named data files
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+                elif len(entry.name) == 45 and entry.name.endswith(".lock"):
+                    locks.append(entry.path[:-5])
+        total = sum(size for _, size, _ in files)
+        evictions = 0
+        files.sort()
+        for _, size, path in files:
+            if total <= self.cache_max_bytes:
+                break
+            if path == keep or not self._remove_cached(path):
+                continue
+            total -= size
+            evictions += 1
+        # locks left behind by failed downloads or by evictions in other processes
+        for path in locks:
+            if not os.path.exists(path):
+                self._remove_cached(path)
+        return total, evictions
+
+    def _remove_cached(self, path: str) -> bool:
+        """Delete a cached object with its meta and lock files, unless a download holds its lock."""
+        lock = FileLock(path + ".lock", timeout=0)
+        try:
+            lock.acquire()
+        except Timeout:
+            return False
+        try:
+            for stale in (path, path + ".meta", path + ".lock"):
+                _remove_if_exists(stale)
+        finally:
+            lock.release()
+        return True
+
+    async def list_objects(self, prefix: Optional[str] = "", bucket_name: Optional[str] = None,
+                           page_size: Optional[int] = 1000,
+                           start_after: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the listing entries (Key, Size, ETag, ...) under prefix, one page at a time."""
+        if not bucket_name:
+            bucket_name = self.bucket_name
+        client = await self.client()
+        kwargs = {"StartAfter": start_after} if start_after else {}
+        paginator = client.get_paginator("list_objects_v2")
+        async for page in paginator.paginate(
+                Bucket=bucket_name, Prefix=prefix, PaginationConfig={"PageSize": page_size}, **kwargs):
+            for entry in page.get("Contents", ()):
+                yield entry
+
+    async def read_many(self, object_names: Union[Iterable[str], AsyncIterable[str]],
+                        bucket_name: Optional[str] = None, concurrency: Optional[int] = 16,
+                        stats: Optional[Dict[str, Any]] = None
+                        ) -> AsyncIterator[Tuple[str, Optional[bytes], Optional[Exception]]]:
+        """
+        Read objects with at most concurrency requests in flight, yielding
+        (name, data, None) or (name, None, error) in completion order. Names
+        are pulled lazily and finished reads wait for the consumer, so memory
+        stays bounded. stats, if given, is kept up to date with objects,
+        errors, bytes, elapsed and bytes_per_second.
+        """
+        if stats is None:
+            stats = {}
+        stats.update(objects=0, errors=0, bytes=0, elapsed=0.0, bytes_per_second=0.0)
+        started = time.perf_counter()
+        results = fan_out(object_names, lambda name: self.read_file(name, bucket_name), concurrency)
+        try:
+            async for result in results:
+                stats["objects"] += 1
+                if result[2] is None:
+                    stats["bytes"] += len(result[1])
+                else:
+                    stats["errors"] += 1
+                stats["elapsed"] = elapsed = time.perf_counter() - started
+                stats["bytes_per_second"] = stats["bytes"] / elapsed if elapsed else 0.0
+                yield result
+        finally:
+            # stops the reads in flight when the consumer leaves early
+            await results.aclose()
+
+    def fetch_prefix(self, prefix: str, bucket_name: Optional[str] = None,
+                     concurrency: Optional[int] = 16, stats: Optional[Dict[str, Any]] = None
+                     ) -> AsyncIterator[Tuple[str, Optional[bytes], Optional[Exception]]]:
+        """read_many over every object under prefix, listing while downloading."""
+        names = (entry["Key"] async for entry in self.list_objects(prefix, bucket_name))
+        return self.read_many(names, bucket_name, concurrency, stats)
@@ -1,27 +1,911 @@
 import aioredis
+import asyncio
+import itertools
+import json
+import random
+import sys
+import time
+import uuid
 
-from typing import Optional
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# commands that must keep their own round trip: blocking reads would stall the
+# whole batch, and the rest return objects or iterators rather than replies
+_NOT_PIPELINED = {
+    "blpop", "brpop", "brpoplpush", "blmove", "blmpop", "bzpopmin", "bzpopmax", "bzmpop",
+    "xread", "xreadgroup", "wait", "monitor", "pubsub", "pipeline", "transaction", "lock",
+    "register_script", "scan_iter", "sscan_iter", "hscan_iter", "zscan_iter",
+    "execute", "execute_command", "watch", "unwatch", "multi", "reset", "close",
+    "initialize", "parse_response", "load_external_module", "set_response_callback",
+}
+# reads served from the client-side cache
+_CACHED_COMMANDS = {"get", "hget", "hgetall", "mget"}
+# other reads, everything else evicts the keys it touches from the local cache
+_READ_ONLY_COMMANDS = {
+    "exists", "type", "ttl", "pttl", "strlen", "getrange", "hexists", "hkeys", "hvals", "hlen",
+    "hmget", "hstrlen", "llen", "lrange", "lindex", "scard", "smembers", "sismember",
+    "smismember", "srandmember", "zcard", "zcount", "zrange", "zrangebyscore", "zrevrange",
+    "zrevrangebyscore", "zrank", "zrevrank", "zscore", "zmscore", "scan", "sscan", "hscan",
+    "zscan", "keys", "dbsize", "ping", "info", "echo", "time", "xlen", "xrange", "xrevrange",
+}
+_MISS = object()
+
+
+def _norm_key(key: Any) -> str:
+    if isinstance(key, str):
+        return key
+    if isinstance(key, (bytes, bytearray, memoryview)):
+        return bytes(key).decode("utf-8", "surrogateescape")
+    return str(key)
+
+
+# value codecs for the bulk helpers: name -> (loads, dumps, binary). binary
+# codecs need decode_responses=False so replies come back as bytes
+_CODECS: Dict[str, Tuple[Callable[[Any], Any], Callable[[Any], Any], bool]] = {}
+
+
+def register_codec(name: str, loads: Callable[[Any], Any], dumps: Callable[[Any], Any],
+                   binary: Optional[bool] = False):
+    _CODECS[name] = (loads, dumps, binary)
+
+
+register_codec("raw", lambda value: value, lambda value: value)
+if orjson is not None:
+    register_codec("json", orjson.loads, orjson.dumps)
+else:
+    register_codec("json", json.loads, lambda value: json.dumps(value, ensure_ascii=False))
+if msgpack is not None:
+    register_codec("msgpack", lambda value: msgpack.unpackb(value, raw=False),
+                   lambda value: msgpack.packb(value, use_bin_type=True), binary=True)
+
+
+def _chunks(iterable: Iterable, size: int) -> Iterable[list]:
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class _TrackingConnection(object):
+    # mixed into the pool's connection class; before its next command a
+    # connection redirects its invalidations to the current listener, so
+    # connections opened earlier or before a listener reconnect catch up
+    tracking_redirect = None
+    _tracking = None
+
+    async def on_connect(self):
+        self._tracking = _MISS  # AUTH/SELECT go out untracked
+        try:
+            await super().on_connect()
+        finally:
+            self._tracking = None
+
+    async def send_packed_command(self, command, check_health=True):
+        redirect = self.tracking_redirect
+        if redirect is not None and self._tracking is not _MISS and self._tracking != redirect:
+            await super().send_packed_command(
+                self.pack_command("CLIENT", "TRACKING", "ON", "REDIRECT", redirect), False)
+            reply = await self.read_response()
+            if _norm_key(reply) != "OK":
+                raise aioredis.ConnectionError(f"CLIENT TRACKING failed: {reply}")
+            self._tracking = redirect
+        await super().send_packed_command(command, check_health)
+
+
+class _PoolStats(object):
+    # mixed into the connection pool to time how long callers wait for a connection
+    def reset(self):
+        super().reset()
+        self.checkouts = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+
+    async def get_connection(self, command_name, *keys, **options):
+        start = time.perf_counter()
+        try:
+            return await super().get_connection(command_name, *keys, **options)
+        finally:
+            waited = time.perf_counter() - start
+            self.checkouts += 1
+            self.wait_time += waited
+            if waited > self.max_wait:
+                self.max_wait = waited
+
+
+class _ConnectionPool(_PoolStats, aioredis.ConnectionPool):
+    pass
+
+
+class _BlockingConnectionPool(_PoolStats, aioredis.BlockingConnectionPool):
+    pass
+
+
+class _LocalCache(object):
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: "OrderedDict[tuple, Tuple[float, Any]]" = OrderedDict()
+        self.by_key: Dict[str, set] = {}
+        # a read may only fill the cache if its key wasn't invalidated meanwhile
+        self.inflight: Dict[str, object] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def lookup(self, entry: tuple) -> Any:
+        cached = self.entries.get(entry)
+        if cached is not None:
+            if cached[0] > time.monotonic():
+                self.entries.move_to_end(entry)
+                self.hits += 1
+                return cached[1]
+            self._drop(entry)
+        self.misses += 1
+        return _MISS
+
+    def begin(self, key: str) -> object:
+        token = self.inflight[key] = object()
+        return token
+
+    def store(self, entry: tuple, key: str, token: object, value: Any):
+        if self.inflight.get(key) is not token:
+            return
+        del self.inflight[key]
+        self.entries[entry] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(entry)
+        self.by_key.setdefault(key, set()).add(entry)
+        while len(self.entries) > self.max_size:
+            self._drop(next(iter(self.entries)))
+            self.evictions += 1
+
+    def abandon(self, key: str, token: object):
+        if self.inflight.get(key) is token:
+            del self.inflight[key]
+
+    def invalidate(self, key: str):
+        self.inflight.pop(key, None)
+        entries = self.by_key.pop(key, None)
+        if entries:
+            self.invalidations += 1
+            for entry in entries:
+                self.entries.pop(entry, None)
+
+    def clear(self):
+        self.inflight.clear()
+        self.entries.clear()
+        self.by_key.clear()
+
+    def _drop(self, entry: tuple):
+        self.entries.pop(entry, None)
+        entries = self.by_key.get(entry[1])
+        if entries is not None:
+            entries.discard(entry)
+            if not entries:
+                del self.by_key[entry[1]]
 
 
 class RedisUtils(object):
     def __init__(self, redis_url: str,
                  password: Optional[str] = None,
                  decode_responses: Optional[bool] = True,
+                 auto_pipeline: Optional[bool] = False,
+                 pipeline_window: Optional[float] = 0.0,
+                 pipeline_max_batch: Optional[int] = 128,
+                 client_cache: Optional[bool] = False,
+                 client_cache_size: Optional[int] = 10000,
+                 client_cache_ttl: Optional[float] = 60.0,
+                 client_cache_invalidation: Optional[str] = "tracking",
+                 max_connections: Optional[int] = None,
+                 pool_timeout: Optional[float] = 20.0,
+                 health_check_interval: Optional[int] = 0,
+                 socket_keepalive: Optional[bool] = False,
+                 codec: Optional[str] = "raw",
                  **kwargs):
         self.redis_url = redis_url
         self.redis_kwargs = dict(
             password=password,
             decode_responses=decode_responses,
             **kwargs)
+        # only when set: unix socket connections take no socket_keepalive
+        if health_check_interval:
+            self.redis_kwargs["health_check_interval"] = health_check_interval
+        if socket_keepalive and not redis_url.startswith("unix://"):
+            self.redis_kwargs["socket_keepalive"] = socket_keepalive
+        # with max_connections set, callers wait up to pool_timeout seconds
+        # for a free connection instead of opening more
+        self.max_connections = max_connections
+        self.pool_timeout = pool_timeout
+        # default codec of mget_many/mset_many and the scan helpers
+        self.codec = codec
+        # the client is created on first use, connect() is optional
         self.redis = None
+        # commands resolved by __getattr__, stored on the instance until disconnect
+        self._bound = set()
+        # commands issued within pipeline_window seconds (0: the same event loop
+        # tick) are sent as one pipeline of at most pipeline_max_batch commands
+        self.auto_pipeline = auto_pipeline
+        self.pipeline_window = pipeline_window
+        self.pipeline_max_batch = pipeline_max_batch
+        self.pipeline_stats = {
+            "commands": 0,
+            "batches": 0,
+            "round_trips_saved": 0,
+            "max_batch": 0,
+            "batch_sizes": {}
+        }
+        self._pending: List[Tuple[str, tuple, dict, asyncio.Future]] = []
+        self._flush_handle = None
+        self._flush_tasks = set()
+        self._pipelinable: Dict[str, bool] = {}
+        # GET/HGET/HGETALL/MGET replies are kept locally and dropped when redis
+        # reports the key changed, through CLIENT TRACKING (redis >= 6) or
+        # keyspace notifications ("keyspace", needs notify-keyspace-events K)
+        self.client_cache = client_cache
+        self.client_cache_invalidation = client_cache_invalidation
+        self._cache = _LocalCache(client_cache_size, client_cache_ttl) if client_cache else None
+        self._cache_ready = False
+        self._connection_base = None
+        self._connection_class = None
+        self._invalidation_conn = None
+        self._invalidation_task = None
+        # lua sources -> registered scripts, run with EVALSHA
+        self._scripts: Dict[str, Any] = {}
+
+    def _client(self) -> aioredis.Redis:
+        redis = self.redis
+        if redis is not None:
+            return redis
+        if self._cache is not None and self.client_cache_invalidation not in ("tracking", "keyspace"):
+            raise ValueError(
+                f"Unsupported client cache invalidation: {self.client_cache_invalidation}")
+        if self.max_connections:
+            pool = _BlockingConnectionPool.from_url(
+                self.redis_url, max_connections=self.max_connections,
+                timeout=self.pool_timeout, **self.redis_kwargs)
+        else:
+            pool = _ConnectionPool.from_url(self.redis_url, **self.redis_kwargs)
+        if self._cache is not None:
+            # the url decides the base class (rediss://, unix://)
+            self._connection_base = pool.connection_class
+            if self.client_cache_invalidation == "tracking":
+                self._connection_class = type(
+                    "TrackingConnection", (_TrackingConnection, self._connection_base), {})
+                pool.connection_class = self._connection_class
+        redis = self.redis = aioredis.Redis(connection_pool=pool)
+        return redis
 
     async def connect(self):
-        self.redis = await aioredis.from_url(self.redis_url, **self.redis_kwargs)
+        self._client()
+        if self._cache is not None and self._invalidation_task is None:
+            await self._open_invalidation()
+            self._start_listener()
+
+    def _start_listener(self):
+        if self._invalidation_task is None:
+            self._invalidation_task = asyncio.get_running_loop().create_task(
+                self._listen_invalidations())
+
+    @property
+    def pool_stats(self) -> Dict[str, Any]:
+        if self.redis is None:
+            return {}
+        pool = self.redis.connection_pool
+        if isinstance(pool, aioredis.BlockingConnectionPool):
+            created = len(pool._connections)
+            idle = sum(1 for connection in pool.pool._queue if connection is not None)
+        else:
+            created = pool._created_connections
+            idle = len(pool._available_connections)
+        return {
+            "max_connections": self.max_connections,
+            "created": created,
+            "in_use": created - idle,
+            "idle": idle,
+            "checkouts": pool.checkouts,
+            "wait_time": pool.wait_time,
+            "avg_wait": pool.wait_time / pool.checkouts if pool.checkouts else 0.0,
+            "max_wait": pool.max_wait
+        }
 
     async def disconnect(self):
+        await self.flush_pipeline()
+        for func in self._bound:
+            self.__dict__.pop(func, None)
+        self._bound.clear()
+        self._scripts.clear()
+        if self._invalidation_task is not None:
+            self._invalidation_task.cancel()
+            try:
+                await self._invalidation_task
+            except asyncio.CancelledError:
+                pass
+            self._invalidation_task = None
+        if self._invalidation_conn is not None:
+            await self._invalidation_conn.disconnect()
+            self._invalidation_conn = None
+        if self._cache is not None:
+            self._cache_ready = False
+            self._cache.clear()
         if self.redis:
             await self.redis.close()
+            await self.redis.connection_pool.disconnect()
             self.redis = None
 
-    def __getattribute__(self, func):
-        return getattr(self.redis, func)
+    def _codec(self, codec: Optional[str]) -> Tuple[Callable[[Any], Any], Callable[[Any], Any]]:
+        codec = codec or self.codec
+        if codec not in _CODECS:
+            raise ValueError(f"Unsupported codec: {codec}")
+        loads, dumps, binary = _CODECS[codec]
+        if binary and self.redis_kwargs.get("decode_responses"):
+            raise ValueError(f"Codec {codec} needs decode_responses=False")
+        return loads, dumps
+
+    async def mget_many(self, keys: Iterable, chunk_size: Optional[int] = 1000,
+                        codec: Optional[str] = None) -> List[Any]:
+        """Fetch and decode any number of keys, one MGET per chunk_size keys; missing keys are None."""
+        loads, _ = self._codec(codec)
+        redis = self._client()
+        values = []
+        for chunk in _chunks(keys, chunk_size):
+            for value in await redis.mget(chunk):
+                values.append(None if value is None else loads(value))
+        return values
+
+    async def mset_many(self, items: Union[Dict[Any, Any], Iterable[Tuple[Any, Any]]],
+                        chunk_size: Optional[int] = 1000, ex: Optional[int] = None,
+                        codec: Optional[str] = None) -> int:
+        """
+        Encode and store a mapping or (key, value) pairs, chunk_size keys per
+        round trip (MSET, or a pipeline of SET ... EX when ex is given).
+        Returns the number of keys written.
+        """
+        _, dumps = self._codec(codec)
+        redis = self._client()
+        if isinstance(items, dict):
+            items = items.items()
+        written = 0
+        for chunk in _chunks(items, chunk_size):
+            if ex is None:
+                await redis.mset({key: dumps(value) for key, value in chunk})
+            else:
+                pipe = redis.pipeline(transaction=False)
+                for key, value in chunk:
+                    pipe.set(key, dumps(value), ex=ex)
+                await pipe.execute()
+            if self._cache is not None:
+                for key, _ in chunk:
+                    self._cache.invalidate(_norm_key(key))
+            written += len(chunk)
+        return written
+
+    async def scan_keys(self, match: Optional[str] = None, count: Optional[int] = 1000,
+                        _type: Optional[str] = None) -> AsyncIterator[Any]:
+        """Yield keys as SCAN returns them."""
+        async for key in self._client().scan_iter(match=match, count=count, _type=_type):
+            yield key
+
+    async def hscan_items(self, name: Any, match: Optional[str] = None,
+                          count: Optional[int] = 1000,
+                          codec: Optional[str] = None) -> AsyncIterator[Tuple[Any, Any]]:
+        """Yield (field, decoded value) pairs of a hash as HSCAN returns them."""
+        loads, _ = self._codec(codec)
+        redis = self._client()
+        cursor = "0"
+        while cursor != 0:
+            cursor, data = await redis.hscan(name, cursor=cursor, match=match, count=count)
+            for field, value in data.items():
+                yield field, loads(value)
+
+    async def sscan_members(self, name: Any, match: Optional[str] = None,
+                            count: Optional[int] = 1000,
+                            codec: Optional[str] = None) -> AsyncIterator[Any]:
+        """Yield the decoded members of a set as SSCAN returns them."""
+        loads, _ = self._codec(codec)
+        redis = self._client()
+        cursor = "0"
+        while cursor != 0:
+            cursor, data = await redis.sscan(name, cursor=cursor, match=match, count=count)
+            for member in data:
+                yield loads(member)
+
+    @property
+    def cache_stats(self) -> Dict[str, Any]:
+        cache = self._cache
+        if cache is None:
+            return {}
+        lookups = cache.hits + cache.misses
+        return {
+            "hits": cache.hits,
+            "misses": cache.misses,
+            "hit_rate": cache.hits / lookups if lookups else 0.0,
+            "invalidations": cache.invalidations,
+            "evictions": cache.evictions,
+            "size": len(cache.entries)
+        }
+
+    async def _open_invalidation(self):
+        pool = self.redis.connection_pool
+        conn = self._connection_base(**pool.connection_kwargs)
+        await conn.connect()
+        if self._connection_class is not None:
+            await conn.send_command("CLIENT", "ID")
+            client_id = await conn.read_response()
+            await conn.send_command("SUBSCRIBE", "__redis__:invalidate")
+            await conn.read_response()
+            self._connection_class.tracking_redirect = client_id
+        else:
+            db = pool.connection_kwargs.get("db", 0)
+            await conn.send_command("PSUBSCRIBE", f"__keyspace@{db}__:*")
+            await conn.read_response()
+        self._invalidation_conn = conn
+        self._cache_ready = True
+
+    async def _listen_invalidations(self):
+        while True:
+            try:
+                if self._invalidation_conn is None:
+                    await self._open_invalidation()
+                while True:
+                    self._handle_invalidation(await self._invalidation_conn.read_response())
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # invalidations may have been missed, stop serving from the cache
+                # until the listener is back
+                self._cache_ready = False
+                self._cache.clear()
+                if self._invalidation_conn is not None:
+                    await self._invalidation_conn.disconnect()
+                    self._invalidation_conn = None
+                await asyncio.sleep(1)
+
+    def _handle_invalidation(self, message: Any):
+        if not isinstance(message, list) or not message:
+            return
+        kind = _norm_key(message[0])
+        if kind == "message":
+            keys = message[2]
+            if keys is None:  # FLUSHDB / FLUSHALL
+                self._cache.clear()
+            else:
+                for key in keys:
+                    self._cache.invalidate(_norm_key(key))
+        elif kind == "pmessage":
+            self._cache.invalidate(_norm_key(message[2]).split(":", 1)[1])
+
+    def _command(self, func: str) -> Any:
+        if self.auto_pipeline and self._is_pipelinable(func):
+            return lambda *args, **kwargs: self._enqueue(func, args, kwargs)
+        return getattr(self._client(), func)
+
+    async def _cached_read(self, entry: tuple, func: str, args: tuple, kwargs: dict) -> Any:
+        cache = self._cache
+        value = cache.lookup(entry)
+        if value is not _MISS:
+            return value
+        key = entry[1]
+        token = cache.begin(key)
+        try:
+            value = await self._command(func)(*args, **kwargs)
+        except BaseException:
+            cache.abandon(key, token)
+            raise
+        cache.store(entry, key, token, value)
+        return value
+
+    async def _cached_get(self, name, *args, **kwargs):
+        if not self._cache_ready or args or kwargs:
+            self._start_listener()
+            return await self._command("get")(name, *args, **kwargs)
+        return await self._cached_read(("get", _norm_key(name)), "get", (name,), {})
+
+    async def _cached_hget(self, name, key, *args, **kwargs):
+        if not self._cache_ready or args or kwargs:
+            self._start_listener()
+            return await self._command("hget")(name, key, *args, **kwargs)
+        return await self._cached_read(
+            ("hget", _norm_key(name), _norm_key(key)), "hget", (name, key), {})
+
+    async def _cached_hgetall(self, name, *args, **kwargs):
+        if not self._cache_ready or args or kwargs:
+            self._start_listener()
+            return await self._command("hgetall")(name, *args, **kwargs)
+        # callers get their own dict, the cached one must stay untouched
+        return dict(await self._cached_read(("hgetall", _norm_key(name)), "hgetall", (name,), {}))
+
+    async def _cached_mget(self, keys, *args, **kwargs):
+        if not self._cache_ready or kwargs:
+            self._start_listener()
+            return await self._command("mget")(keys, *args, **kwargs)
+        keys = list(keys) if isinstance(keys, (list, tuple)) else [keys]
+        keys.extend(args)
+        cache = self._cache
+        # MGET is answered from the same entries GET fills, fetching only the misses
+        values = [cache.lookup(("get", _norm_key(key))) for key in keys]
+        missing = [i for i, value in enumerate(values) if value is _MISS]
+        if missing:
+            tokens = [cache.begin(_norm_key(keys[i])) for i in missing]
+            try:
+                fetched = await self._command("mget")([keys[i] for i in missing])
+            except BaseException:
+                for i, token in zip(missing, tokens):
+                    cache.abandon(_norm_key(keys[i]), token)
+                raise
+            for i, token, value in zip(missing, tokens, fetched):
+                key = _norm_key(keys[i])
+                cache.store(("get", key), key, token, value)
+                values[i] = value
+        return values
+
+    def _evict_args(self, args: tuple, kwargs: dict):
+        cache = self._cache
+        for arg in (*args, *kwargs.values()):
+            if isinstance(arg, dict):
+                for key in arg:
+                    cache.invalidate(_norm_key(key))
+            elif isinstance(arg, (list, tuple)):
+                for key in arg:
+                    if isinstance(key, (str, bytes)):
+                        cache.invalidate(_norm_key(key))
+            elif isinstance(arg, (str, bytes)):
+                cache.invalidate(_norm_key(arg))
+
+    def _evicting(self, func: str) -> Any:
+        command = self._command(func)
+
+        async def call(*args, **kwargs):
+            # evict before and after, so our own writes are visible right away
+            # even before redis' invalidation message arrives
+            self._evict_args(args, kwargs)
+            try:
+                return await command(*args, **kwargs)
+            finally:
+                self._evict_args(args, kwargs)
+        return call
+
+    def __getattr__(self, func):
+        # only reached for names RedisUtils itself doesn't define; commands are
+        # resolved once and stored on the instance, later lookups skip this
+        if func.startswith("__") or "redis_url" not in self.__dict__:
+            raise AttributeError(f"'RedisUtils' object has no attribute '{func}'")
+        attr = getattr(self._client(), func)
+        if not callable(attr):
+            return attr
+        if self._is_command(func):
+            if self._cache is not None and func in _CACHED_COMMANDS:
+                attr = getattr(self, f"_cached_{func}")
+            elif self._cache is not None and func not in _READ_ONLY_COMMANDS:
+                attr = self._evicting(func)
+            elif self.auto_pipeline:
+                attr = self._command(func)
+        self.__dict__[func] = attr
+        self._bound.add(func)
+        return attr
+
+    def _is_command(self, func: str) -> bool:
+        return not func.startswith("_") and func not in _NOT_PIPELINED \
+            and callable(getattr(aioredis.client.Pipeline, func, None))
+
+    def _is_pipelinable(self, func: str) -> bool:
+        pipelinable = self._pipelinable.get(func)
+        if pipelinable is None:
+            pipelinable = self._is_command(func)
+            self._pipelinable[func] = pipelinable
+        return pipelinable
+
+    def _enqueue(self, func: str, args: tuple, kwargs: dict) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((func, args, kwargs, future))
+        if len(self._pending) >= self.pipeline_max_batch:
+            self._schedule_flush()
+        elif self._flush_handle is None:
+            if self.pipeline_window > 0:
+                self._flush_handle = loop.call_later(self.pipeline_window, self._schedule_flush)
+            else:
+                self._flush_handle = loop.call_soon(self._schedule_flush)
+        return future
+
+    def _schedule_flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._send(batch))
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_tasks.discard)
+
+    async def _send(self, batch: List[Tuple[str, tuple, dict, asyncio.Future]]):
+        size = len(batch)
+        stats = self.pipeline_stats
+        stats["commands"] += size
+        stats["batches"] += 1
+        stats["round_trips_saved"] += size - 1
+        stats["max_batch"] = max(stats["max_batch"], size)
+        stats["batch_sizes"][size] = stats["batch_sizes"].get(size, 0) + 1
+        try:
+            if size == 1:
+                func, args, kwargs, _ = batch[0]
+                results = [await getattr(self.redis, func)(*args, **kwargs)]
+            else:
+                pipe = self.redis.pipeline(transaction=False)
+                for func, args, kwargs, _ in batch:
+                    getattr(pipe, func)(*args, **kwargs)
+                results = await pipe.execute(raise_on_error=False)
+        except Exception as e:
+            # the connection failed, so every command in the batch did
+            results = [e] * size
+        for (_, _, _, future), result in zip(batch, results):
+            if future.done():  # the caller gave up waiting
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def flush_pipeline(self):
+        """Send any commands still waiting for their batch and wait for the replies."""
+        if self._pending:
+            self._schedule_flush()
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+
+    async def run_script(self, source: str, keys: Optional[List[Any]] = None,
+                         args: Optional[List[Any]] = None) -> Any:
+        """Run a lua script with EVALSHA, loading it again if the server answers NOSCRIPT."""
+        redis = self._client()
+        script = self._scripts.get(source)
+        if script is None:
+            script = self._scripts[source] = redis.register_script(source)
+        return await script(keys, args, client=redis)
+
+    def rate_limiter(self, key: str, rate: float, capacity: Optional[float] = None) -> "RateLimiter":
+        return RateLimiter(self, key, rate, capacity)
+
+    def lease_lock(self, name: str, lease: Optional[float] = 10.0) -> "LeaseLock":
+        return LeaseLock(self, name, lease)
+
+    def batched_counter(self, flush_interval: Optional[float] = 1.0,
+                        expire: Optional[int] = None,
+                        max_pending: Optional[int] = None) -> "BatchedCounter":
+        return BatchedCounter(self, flush_interval, expire, max_pending)
+
+
+# KEYS: bucket; ARGV: rate (tokens/s), capacity, requested. uses the server
+# clock, so limiters on different hosts agree
+_TOKEN_BUCKET = """
+pcall(redis.replicate_commands)
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call("HMGET", KEYS[1], "tokens", "ts")
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= requested then
+    tokens = tokens - requested
+    allowed = 1
+else
+    retry_after = (requested - tokens) / rate
+end
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "ts", tostring(now))
+redis.call("PEXPIRE", KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return {allowed, tostring(retry_after)}
+"""
+
+# KEYS: lock, fencing counter; ARGV: owner, lease ms.
+# returns {fencing token} or {false, pttl of the current holder}
+_LOCK_ACQUIRE = """
+if redis.call("EXISTS", KEYS[1]) == 0 then
+    local token = redis.call("INCR", KEYS[2])
+    redis.call("SET", KEYS[1], ARGV[1] .. ":" .. token, "PX", ARGV[2])
+    return {token}
+end
+return {false, redis.call("PTTL", KEYS[1])}
+"""
+
+# KEYS: lock; ARGV: owner:token
+_LOCK_RELEASE = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+# KEYS: lock; ARGV: owner:token, lease ms
+_LOCK_EXTEND = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("PEXPIRE", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# KEYS: counters; ARGV: increments..., expire seconds (0: none)
+_COUNTER_FLUSH = """
+local expire = tonumber(ARGV[#ARGV])
+local values = {}
+for i, key in ipairs(KEYS) do
+    values[i] = redis.call("INCRBY", key, ARGV[i])
+    if expire > 0 then
+        redis.call("EXPIRE", key, expire)
+    end
+end
+return values
+"""
+
+
+class RateLimiter(object):
+    """Token bucket shared through redis: rate tokens per second, bursts up to capacity."""
+
+    def __init__(self, redis: RedisUtils, key: str, rate: float, capacity: Optional[float] = None):
+        self.redis = redis
+        self.key = key
+        self.rate = rate
+        self.capacity = capacity or rate
+
+    async def acquire(self, tokens: Optional[float] = 1) -> Tuple[bool, float]:
+        """Take tokens if available; returns (allowed, seconds until they would be)."""
+        allowed, retry_after = await self.redis.run_script(
+            _TOKEN_BUCKET, [self.key], [self.rate, self.capacity, tokens])
+        return bool(allowed), float(retry_after)
+
+    async def wait(self, tokens: Optional[float] = 1):
+        """Block until tokens could be taken."""
+        while True:
+            allowed, retry_after = await self.acquire(tokens)
+            if allowed:
+                return
+            await asyncio.sleep(retry_after)
+
+
+class LeaseLock(object):
+    """
+    Lock that expires after lease seconds unless extended. Each acquisition
+    gets a fencing token that increases monotonically per lock name; pass it
+    to the protected resource so writes from an expired holder can be rejected.
+    """
+
+    def __init__(self, redis: RedisUtils, name: str, lease: Optional[float] = 10.0):
+        self.redis = redis
+        self.name = name
+        self.fence_key = f"{name}:fence"
+        self.lease = lease
+        self.owner = uuid.uuid4().hex
+        self.token: Optional[int] = None
+
+    async def acquire(self, blocking: Optional[bool] = True, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            reply = await self.redis.run_script(
+                _LOCK_ACQUIRE, [self.name, self.fence_key], [self.owner, int(self.lease * 1000)])
+            if reply[0]:
+                self.token = int(reply[0])
+                return True
+            if not blocking:
+                return False
+            # retry around when the current lease runs out, jittered so waiters
+            # don't all come back at once
+            delay = max(int(reply[1]), 10) / 1000 * random.uniform(0.5, 1.0)
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                delay = min(delay, remaining)
+            await asyncio.sleep(delay)
+
+    async def release(self) -> bool:
+        if self.token is None:
+            return False
+        released = await self.redis.run_script(
+            _LOCK_RELEASE, [self.name], [f"{self.owner}:{self.token}"])
+        self.token = None
+        return bool(released)
+
+    async def extend(self, lease: Optional[float] = None) -> bool:
+        """Restart the lease, fails if the lock was lost meanwhile."""
+        if self.token is None:
+            return False
+        return bool(await self.redis.run_script(
+            _LOCK_EXTEND, [self.name],
+            [f"{self.owner}:{self.token}", int((lease or self.lease) * 1000)]))
+
+    async def __aenter__(self) -> "LeaseLock":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.release()
+
+
+class BatchedCounter(object):
+    """
+    Counters incremented locally and written every flush_interval seconds,
+    all pending keys in one script call. Failed flushes keep their
+    increments for the next one; with max_pending set, increments of new
+    keys beyond that many pending keys are dropped and counted.
+    """
+
+    def __init__(self, redis: RedisUtils, flush_interval: Optional[float] = 1.0,
+                 expire: Optional[int] = None, max_pending: Optional[int] = None):
+        self.redis = redis
+        self.flush_interval = flush_interval
+        self.expire = expire
+        self.max_pending = max_pending
+        self.pending: Dict[str, int] = {}
+        self.stats = {
+            "flushes": 0,
+            "failures": 0,  # consecutive failed background flushes
+            "dropped": 0,
+        }
+        self.last_error: Optional[BaseException] = None
+        self._flush_task = None
+
+    def incr(self, key: str, amount: Optional[int] = 1):
+        pending = self.pending
+        if self.max_pending is not None and key not in pending and len(pending) >= self.max_pending:
+            self.stats["dropped"] += 1
+            return
+        pending[key] = pending.get(key, 0) + amount
+        if self._flush_task is None:
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            stats = self.stats
+            try:
+                await self.flush()
+            except Exception as e:
+                # increments were put back, the next tick retries
+                if not stats["failures"]:
+                    sys.stderr.write(f"BatchedCounter flush failed, {len(self.pending)} keys pending: {e}\n")
+                stats["failures"] += 1
+                self.last_error = e
+                continue
+            if stats["failures"]:
+                sys.stderr.write(f"BatchedCounter flushed again after {stats['failures']} failures\n")
+                stats["failures"] = 0
+
+    async def flush(self) -> Dict[str, int]:
+        """Write pending increments now; returns the new totals."""
+        pending, self.pending = self.pending, {}
+        if not pending:
+            return {}
+        keys = list(pending)
+        try:
+            values = await self.redis.run_script(
+                _COUNTER_FLUSH, keys, [*pending.values(), self.expire or 0])
+        except BaseException:
+            for key, amount in pending.items():
+                self.pending[key] = self.pending.get(key, 0) + amount
+            raise
+        self.stats["flushes"] += 1
+        return dict(zip(keys, values))
+
+    async def aclose(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
@@ -0,0 +1,34 @@
+import asyncio
+
+from configs import ConfigUtils, get_codec
+
+
+def test_json_round_trip_keeps_wide_ints(tmp_path):
+    config = {"limits": {"huge": 2 ** 70, "negative": -(2 ** 80), "u64": 2 ** 64 - 1, "small": 7, "ratio": 0.5}}
+
+    async def round_trip():
+        await ConfigUtils(tmp_path / "c.json").save(config)
+        return await ConfigUtils(tmp_path / "c.json").read()
+
+    loaded = asyncio.run(round_trip())
+    assert loaded == config
+    assert type(loaded["limits"]["huge"]) is int
+
+
+def test_json_codec_loads_wide_ints():
+    loads, dumps = get_codec("json")
+    assert loads(dumps({"n": 10 ** 30})) == {"n": 10 ** 30}
+
+
+def test_cached_reads_are_independent_copies(tmp_path):
+    async def read_twice():
+        utils = ConfigUtils(tmp_path / "c.json", cache=True)
+        await utils.save({"db": {"hosts": ["a", "b"], "pool": {"size": 4}}})
+        first = await utils.read()
+        first["db"]["hosts"].append("c")
+        first["db"]["pool"]["size"] = 8
+        return await utils.read(), utils.snapshot
+
+    second, snapshot = asyncio.run(read_twice())
+    assert second == {"db": {"hosts": ["a", "b"], "pool": {"size": 4}}}
+    assert snapshot.get("db.pool.size") == 4
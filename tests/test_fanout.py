@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+from _fanout import fan_out
+
+
+async def collect(items, func, concurrency):
+    return [result async for result in fan_out(items, func, concurrency)]
+
+
+def test_bounded_concurrency_and_errors():
+    running = peak = 0
+
+    async def work(item):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        if item == 3:
+            raise ValueError(item)
+        return item * 2
+
+    results = asyncio.run(collect(range(10), work, 4))
+    assert peak == 4
+    assert sorted((item, result) for item, result, error in results if error is None) == \
+        [(i, i * 2) for i in range(10) if i != 3]
+    assert [type(error) for item, _, error in results if item == 3] == [ValueError]
+
+
+def test_async_source_error_is_raised():
+    async def source():
+        yield 1
+        raise RuntimeError("listing failed")
+
+    async def echo(item):
+        return item
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(collect(source(), echo, 2))
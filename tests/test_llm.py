@@ -0,0 +1,76 @@
+import asyncio
+import json
+
+import httpx
+
+from llm import OpenAILLM, StreamChunk
+
+STREAM = [
+    {"id": "c1", "object": "chat.completion.chunk", "created": 1, "model": "x",
+     "choices": [{"index": 0, "delta": {"role": "assistant", "content": "Hello"}, "finish_reason": None}]},
+    {"id": "c1", "object": "chat.completion.chunk", "created": 1, "model": "x",
+     "choices": [{"index": 0, "delta": {"content": " there"}, "finish_reason": "stop"}]},
+]
+
+
+ANSWER = {
+    "id": "c2", "object": "chat.completion", "created": 1, "model": "x",
+    "choices": [{"index": 0, "finish_reason": "tool_calls", "message": {
+        "role": "assistant", "content": None,
+        "tool_calls": [{"id": "call_1", "type": "function", "function": {"name": "get", "arguments": "{}"}}]}}],
+    "usage": {"prompt_tokens": 5, "completion_tokens": 3, "total_tokens": 8},
+}
+
+
+def mock_client(requests):
+    def handler(request):
+        body = json.loads(request.content)
+        requests.append(body)
+        if not body.get("stream"):
+            return httpx.Response(200, json=ANSWER)
+        events = "".join(f"data: {json.dumps(chunk)}\n\n" for chunk in STREAM) + "data: [DONE]\n\n"
+        return httpx.Response(200, text=events, headers={"content-type": "text/event-stream"})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def test_stream_chunks_are_dicts_unless_compact():
+    requests = []
+
+    async def stream(**kwargs):
+        async with OpenAILLM(base_url="http://llm.test/v1", api_key="k", cache=True,
+                             http_client=mock_client(requests), **kwargs) as llm:
+            first = [chunk async for chunk in llm.chatStream([{"role": "user", "content": "hi"}])]
+            if not llm.compact_chunks:
+                first[0]["choices"][0]["delta"]["content"] = "changed"
+            second = [chunk async for chunk in llm.chatStream([{"role": "user", "content": "hi"}])]
+            return first, second
+
+    first, second = asyncio.run(stream())
+    assert all(type(chunk) is dict for chunk in first + second)
+    # the second stream is served from the cache, untouched by the caller's edit
+    assert second[0]["choices"][0]["delta"]["content"] == "Hello"
+    assert json.loads(json.dumps(second[1]))["choices"][0]["finish_reason"] == "stop"
+    assert len(requests) == 1
+
+    first, _ = asyncio.run(stream(compact_chunks=True))
+    assert isinstance(first[0], StreamChunk)
+    assert first[0]["choices"][0]["delta"]["content"] == "Hello"
+
+
+def test_cached_tool_calls_match_fresh_ones(tmp_path):
+    requests = []
+    messages = [{"role": "user", "content": "weather?"}]
+
+    async def ask():
+        async with OpenAILLM(base_url="http://llm.test/v1", api_key="k", cache=True,
+                             cache_path=str(tmp_path / "cache.db"), http_client=mock_client(requests)) as llm:
+            return await llm.chatNoStream(messages), await llm.chatNoStream(messages), llm.cache_stats
+
+    fresh, memory, _ = asyncio.run(ask())
+    _, disk, stats = asyncio.run(ask())
+    assert stats["disk_hits"] == 1 and len(requests) == 1
+    calls = [response["choices"][0]["message"]["tool_calls"] for response in (fresh, memory, disk)]
+    assert type(calls[2][0]) is type(calls[1][0]) is type(calls[0][0])
+    assert calls[2] == calls[0]
+    assert calls[2][0].function.name == "get"
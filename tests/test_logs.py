@@ -0,0 +1,51 @@
+import asyncio
+import copy
+
+from logs import Levels, Logger, LoggerConfig
+
+
+def test_disabled_sinks_need_no_format(capsys):
+    config = copy.deepcopy(LoggerConfig.DEFAULT_CONFIG)
+    config["print"]["colored"] = False
+    logger = Logger(config, file={"enabled": False})
+    asyncio.run(logger.info("hello {}", "world"))
+    assert "hello world" in capsys.readouterr().out
+
+    logger = Logger(config, print={"enabled": False}, file={"enabled": False})
+    assert not logger.enabled_for(Levels.CRITICAL)
+    asyncio.run(logger.critical("nowhere"))
+    assert capsys.readouterr().err == ""
+
+
+def test_sync_lines_reach_the_file_when_the_loop_is_stopped(tmp_path):
+    config = copy.deepcopy(LoggerConfig.DEFAULT_CONFIG)
+    config["print"]["enabled"] = False
+    config["file"].update(log_root_path=str(tmp_path), log_append_time=False)
+    logger = Logger(config)
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(logger.info("from the loop"))
+        logger.sync.info("from a thread")
+        assert "from a thread" in (tmp_path / "log..txt").read_text()
+        loop.run_until_complete(logger.aclose())
+    finally:
+        loop.close()
+
+
+def test_finished_rotations_are_not_kept(tmp_path):
+    config = copy.deepcopy(LoggerConfig.DEFAULT_CONFIG)
+    config["print"]["enabled"] = False
+    config["file"].update(log_root_path=str(tmp_path), log_append_time=False)
+    config["file"]["rotation"].update(max_bytes=200, backup_count=2)
+    logger = Logger(config)
+
+    async def rotate():
+        for i in range(50):
+            await logger.info("line {} {}", i, "x" * 100)
+        logger._rotation_executor.submit(lambda: None).result()  # let queued rotations finish
+        pending = len(logger._rotation_futures)
+        await logger.aclose()
+        return pending
+
+    assert asyncio.run(rotate()) == 0
+    assert len(list(tmp_path.iterdir())) <= 4